@@ -0,0 +1,96 @@
+"""
+Compare exported SoM detectors with the PyTorch model.
+
+Runs the shipped `best.pt` (or `--baseline`) and every given export on the
+same screenshots and reports the load time, seconds per image after the
+warm-up, boxes found, and recall and precision against the PyTorch boxes
+(a box matches when their intersection over union is at least `--iou`).
+
+Usage:
+    python benchmarks/detector.py best.onnx best_int8.onnx screenshot1.png
+    python benchmarks/detector.py best_openvino_model --capture --threads 4
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image
+
+from operate.models.detector import detector_class, get_weights_path
+from operate.utils.screenshot import capture_frame
+from operate.utils.tracking import box_iou
+
+
+def matches(expected, boxes, threshold):
+    """How many `expected` boxes have their own match among `boxes`."""
+    unmatched = list(boxes)
+    found = 0
+    for box in expected:
+        best = max(unmatched, key=lambda other: box_iou(box, other), default=None)
+        if best is not None and box_iou(box, best) >= threshold:
+            unmatched.remove(best)
+            found += 1
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="Exported models, then screenshots")
+    parser.add_argument("--baseline", default=None, help="PyTorch weights, the shipped best.pt by default")
+    parser.add_argument("--capture", action="store_true", help="Also detect on the current screen")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=5, help="Detections per image")
+    parser.add_argument("--iou", type=float, default=0.5, help="Overlap needed for boxes to match")
+    args = parser.parse_args()
+
+    models = [args.baseline or get_weights_path()]
+    images = []
+    for path in args.paths:
+        if path.lower().endswith((".png", ".jpg", ".jpeg", ".bmp")):
+            images.append(np.asarray(Image.open(path).convert("RGB")))
+        else:
+            models.append(path)
+    if args.capture:
+        images.append(capture_frame().pixels)
+    if not images:
+        parser.error("give screenshots to detect on or --capture")
+
+    baseline = None
+    print(f"{'model':<32} {'load s':>7} {'s/image':>8} {'boxes':>6} {'recall':>7} {'precision':>9}")
+    for weights in models:
+        name = os.path.basename(os.path.normpath(weights))
+        detector = detector_class(weights)(weights, args.threads)
+        try:
+            detector.load()
+        except Exception as e:
+            print(f"{name:<32} unavailable: {e}")
+            continue
+
+        results = []
+        started = time.perf_counter()
+        for pixels in images:
+            for _ in range(args.repeat):
+                boxes = detector.detect(pixels)
+            results.append(boxes)
+        elapsed = (time.perf_counter() - started) / (len(images) * args.repeat)
+
+        if baseline is None:
+            baseline = results
+        found = sum(
+            matches(expected, boxes, args.iou) for expected, boxes in zip(baseline, results)
+        )
+        expected_total = sum(map(len, baseline))
+        total = sum(map(len, results))
+        print(
+            f"{name:<32} {detector.load_time:>7.2f} {elapsed:>8.3f} {total / len(results):>6.1f}"
+            f" {found / max(expected_total, 1):>7.1%} {found / max(total, 1):>9.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
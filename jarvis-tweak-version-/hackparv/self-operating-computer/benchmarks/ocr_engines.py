@@ -0,0 +1,82 @@
+"""
+Compare the OCR engines on the same screenshots.
+
+For every engine that is installed, reports the model load time, seconds per
+image after a warm-up read, elements found, and recall against the first
+engine listed (same text, box center within `--tolerance` pixels).
+
+Usage:
+    python benchmarks/ocr_engines.py screenshot1.png screenshot2.png
+    python benchmarks/ocr_engines.py --capture --engines easyocr,onnx --cpu
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image
+
+from ocr_preprocess import recall
+from operate.utils.ocr_engines import OCR_ENGINES, create_ocr_engine
+from operate.utils.screenshot import capture_frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("images", nargs="*", help="Screenshots to read")
+    parser.add_argument("--capture", action="store_true", help="Read the current screen")
+    parser.add_argument("--engines", default=",".join(OCR_ENGINES))
+    parser.add_argument("--languages", default="en")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=3, help="Reads per image")
+    parser.add_argument("--tolerance", type=float, default=10.0, help="Allowed center offset in pixels")
+    parser.add_argument("--cpu", action="store_true", help="Do not use the GPU")
+    args = parser.parse_args()
+
+    images = [np.asarray(Image.open(path).convert("RGB")) for path in args.images]
+    if args.capture:
+        images.append(capture_frame().pixels)
+    if not images:
+        parser.error("give screenshots to read or --capture")
+
+    baseline = None
+    print(f"{'engine':<12} {'load s':>7} {'s/image':>8} {'elements':>9} {'recall':>7}")
+    for name in args.engines.split(","):
+        engine = create_ocr_engine(
+            name, args.languages.split(","), args.threads, gpu=not args.cpu
+        )
+        started = time.perf_counter()
+        try:
+            engine.load()
+        except Exception as e:
+            print(f"{name:<12} unavailable: {e}")
+            continue
+        load_time = time.perf_counter() - started
+        engine.readtext(images[0])
+
+        results = []
+        started = time.perf_counter()
+        for pixels in images:
+            for _ in range(args.repeat):
+                result = engine.readtext(pixels)
+            results.append(result)
+        elapsed = (time.perf_counter() - started) / (len(images) * args.repeat)
+
+        if baseline is None:
+            baseline = results
+        scores = [
+            recall(expected, result, args.tolerance)
+            for expected, result in zip(baseline, results)
+        ]
+        print(
+            f"{name:<12} {load_time:>7.2f} {elapsed:>8.3f}"
+            f" {sum(map(len, results)) / len(results):>9.1f} {sum(scores) / len(scores):>7.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Measure the speed/accuracy trade-off of OCR preprocessing.
+
+Reads each screenshot at full resolution in color as the baseline, then with
+every combination of the given scales and grayscale, and reports the time
+per image and how many baseline text elements are still found (same text,
+box center within `--tolerance` pixels of the baseline).
+
+Usage:
+    python benchmarks/ocr_preprocess.py screenshot1.png screenshot2.png
+    python benchmarks/ocr_preprocess.py --capture --scales 1,0.75,0.5
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from operate.utils.ocr import OCRService, TextIndex
+from operate.utils.preprocess import OCRPreprocess
+from operate.utils.screenshot import Frame, capture_frame
+
+
+def center(box):
+    xs = [point[0] for point in box]
+    ys = [point[1] for point in box]
+    return (min(xs) + max(xs)) / 2, (min(ys) + max(ys)) / 2
+
+
+def recall(baseline, result, tolerance):
+    """Fraction of baseline elements found again at about the same place."""
+    if not baseline:
+        return 1.0
+    index = TextIndex(result)
+    found = 0
+    for box, text, _ in baseline:
+        match = index.find(text, min_score=0.8)
+        if match is None:
+            continue
+        x, y = center(box)
+        match_x, match_y = center(result[match][0])
+        if abs(x - match_x) <= tolerance and abs(y - match_y) <= tolerance:
+            found += 1
+    return found / len(baseline)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("images", nargs="*", help="Screenshots to read")
+    parser.add_argument("--capture", action="store_true", help="Read the current screen")
+    parser.add_argument("--scales", default="1,0.75,0.5", help="Comma separated resize factors")
+    parser.add_argument("--languages", default="en")
+    parser.add_argument("--repeat", type=int, default=1, help="Reads per image and setting")
+    parser.add_argument("--tolerance", type=float, default=10.0, help="Allowed center offset in pixels")
+    parser.add_argument("--cpu", action="store_true", help="Do not use the GPU")
+    args = parser.parse_args()
+
+    frames = [Frame.from_image(Image.open(path)) for path in args.images]
+    if args.capture:
+        frames.append(capture_frame())
+    if not frames:
+        parser.error("give screenshots to read or --capture")
+
+    settings = [
+        OCRPreprocess(scale=scale, grayscale=grayscale)
+        for scale, grayscale in itertools.product(
+            [float(scale) for scale in args.scales.split(",")], (False, True)
+        )
+    ]
+    baseline_setting = OCRPreprocess()
+    if baseline_setting not in settings:
+        settings.insert(0, baseline_setting)
+
+    languages = args.languages.split(",")
+    baseline = None
+    print(f"{'setting':<40} {'s/image':>8} {'elements':>9} {'recall':>7}")
+    for setting in settings:
+        service = OCRService(languages=languages, gpu=not args.cpu, preprocessing=setting)
+        service.warm_up(background=False)
+
+        results = []
+        started = time.perf_counter()
+        for frame in frames:
+            for _ in range(args.repeat):
+                # `_read` bypasses the per-frame memo, every repeat really runs
+                result = service._read(frame)
+            results.append(result)
+        elapsed = (time.perf_counter() - started) / (len(frames) * args.repeat)
+
+        if setting == baseline_setting:
+            baseline = results
+        scores = [
+            recall(expected, result, args.tolerance)
+            for expected, result in zip(baseline, results)
+        ]
+        print(
+            f"{setting.key:<40} {elapsed:>8.3f} {sum(map(len, results)) / len(results):>9.1f}"
+            f" {sum(scores) / len(scores):>7.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
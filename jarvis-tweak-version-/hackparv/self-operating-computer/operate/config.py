@@ -10,12 +10,85 @@ import anthropic
 from prompt_toolkit.shortcuts import input_dialog
 
 
+def _env_flag(name, default=False):
+    """Read a boolean feature flag such as `OPERATE_FRAME_GRABBER=1` from the environment."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
 class Config:
     """
     Configuration class for managing settings.
 
     Attributes:
         verbose (bool): Flag indicating whether verbose mode is enabled.
+        save_screenshots (bool): Write each captured screenshot to disk for debugging.
+        capture_backend (str): Linux screen capture backend: auto, pil or xshm.
+        capture_region (str): Part of the screen to capture: screen, window (the focused
+            window) or an "x,y,width,height" rectangle.
+        frame_grabber (bool): Sample the screen on a background thread.
+        frame_grabber_fps (float): Sampling rate of the background frame grabber.
+        frame_grabber_buffer_size (int): Number of preallocated frames it cycles through.
+        fixed_sleep (bool): Sleep one second between steps instead of detecting when the screen settled.
+        settle_stable_ms (int): How long the screen must be unchanged to count as settled.
+        settle_timeout (float): Upper bound in seconds on waiting for the screen to settle.
+        change_notifications (str): How to notice screen changes on Linux: auto, damage
+            (X DAMAGE events) or poll (compare captured frames).
+        vision_mode (str): How the screen is sent to the model: full, tiles (only the
+            regions that changed since the last screenshot sent, plus a thumbnail) or
+            focus (a thumbnail plus a full resolution crop around the focus point).
+        tile_size (int): Grid size in pixels used to find changed regions.
+        tiles_max_fraction (float): Send the full frame instead once more than this
+            fraction of the screen changed.
+        thumbnail_size (int): Longest side of the whole-screen thumbnail.
+        focus_size (int): Side in pixels of the full resolution crop of the focus mode.
+        ocr_engine (str): OCR engine: easyocr, tesseract or onnx.
+        ocr_onnx_det_model (str): Optional detection model for the onnx engine.
+        ocr_onnx_rec_model (str): Optional recognition model for the onnx engine.
+        ocr_languages (list): OCR language codes, in EasyOCR's naming.
+        ocr_threads (int): CPU threads used by OCR, None for the engine default.
+        ocr_gpu (bool): Let EasyOCR use the GPU when one is available.
+        ocr_warm_up (bool): Load the OCR models in the background at startup.
+        ocr_speculative (bool): Start OCR as soon as a frame is captured, concurrently
+            with the model request.
+        grounding (str): How OCR models find click targets: ocr (the OCR text only)
+            or hybrid (OCR text and YOLO detections fused, clicks may name a label).
+        vision_workers (int): Worker processes running OCR inference, and as many
+            running YOLO, 0 runs them in the agent process (on a thread, off the
+            event loop).
+        detector_weights (str): Optional YOLO model to use instead of the shipped
+            best.pt, e.g. an ONNX or OpenVINO export of it.
+        yolo_threads (int): CPU threads of the YOLO detector, None for the runtime
+            default. For the PyTorch model this applies to its whole process.
+        detection_tracking (bool): Keep the YOLO detections of the previous step and
+            only detect again where the screen changed; labels keep their numbers.
+        detection_padding (int): Pixels added around changed regions before detecting.
+        som_mode (str): How gpt-4-with-som sends its labels: pixels (drawn into the
+            screenshot) or table (also listed as text, with a thumbnail_size screenshot).
+        som_ocr_text (bool): Add the OCR text inside each box to the table.
+        label_suppression (str): Which detections get no label: overlap (any box
+            touching a labelled one), iou (above label_iou_threshold) or none.
+        label_iou_threshold (float): Intersection over union above which the iou
+            rule drops a box.
+        ocr_scale (float): Resize factor applied to screenshots before OCR.
+        ocr_grayscale (bool): Run OCR on grayscale screenshots.
+        ocr_tiles (bool): Read the screen as tiles and cache their results by content.
+        ocr_tile_size (int): Side of the OCR tiles in pixels.
+        ocr_cache_mb (int): Memory budget of the tile cache.
+        ocr_cache_dir (str): Optional directory persisting the tile cache across runs.
+        image_format (str): Override the image format sent to every provider (JPEG or PNG).
+        image_quality (int): Override the JPEG quality.
+        image_max_side (int): Override the longest side of the image sent to the model.
+        image_grayscale (bool): Send grayscale screenshots.
+        image_colors (int): Quantize screenshots to this many colors (sent as PNG).
+        unchanged_screen (str): What to do when a step left the screen unchanged: send the
+            screenshot anyway ("send"), re-prompt with a text-only note ("note"), or wait
+            with exponential backoff for a change before falling back to the note ("backoff",
+            the default, so slow applications get time to paint). The model is still called
+            with the note, only the screenshot is left out.
+        unchanged_backoff_max (float): Total seconds the "backoff" policy may wait.
         openai_api_key (str): API key for OpenAI.
         google_api_key (str): API key for Google.
         ollama_host (str): url to ollama running remotely.
@@ -32,6 +105,61 @@ class Config:
     def __init__(self):
         load_dotenv()
         self.verbose = False
+        self.save_screenshots = False
+        self.capture_backend = os.getenv("OPERATE_CAPTURE_BACKEND", "auto")
+        self.capture_region = os.getenv("OPERATE_CAPTURE_REGION", "screen")
+        self.frame_grabber = _env_flag("OPERATE_FRAME_GRABBER")
+        self.frame_grabber_fps = float(os.getenv("OPERATE_FRAME_GRABBER_FPS", "10"))
+        self.frame_grabber_buffer_size = int(
+            os.getenv("OPERATE_FRAME_GRABBER_BUFFER", "4")
+        )
+        self.fixed_sleep = _env_flag("OPERATE_FIXED_SLEEP")
+        self.settle_stable_ms = int(os.getenv("OPERATE_SETTLE_MS", "300"))
+        self.settle_timeout = float(os.getenv("OPERATE_SETTLE_TIMEOUT", "2"))
+        self.settle_poll_interval = 0.05
+        self.vision_mode = os.getenv("OPERATE_VISION_MODE", "full")
+        self.tile_size = int(os.getenv("OPERATE_TILE_SIZE", "128"))
+        self.tiles_max_fraction = 0.5
+        self.thumbnail_size = int(os.getenv("OPERATE_THUMBNAIL_SIZE", "512"))
+        self.focus_size = int(os.getenv("OPERATE_FOCUS_SIZE", "768"))
+        self.ocr_engine = os.getenv("OPERATE_OCR_ENGINE", "easyocr")
+        self.ocr_onnx_det_model = os.getenv("OPERATE_OCR_ONNX_DET_MODEL")
+        self.ocr_onnx_rec_model = os.getenv("OPERATE_OCR_ONNX_REC_MODEL")
+        self.ocr_languages = [
+            language.strip()
+            for language in os.getenv("OPERATE_OCR_LANGUAGES", "en").split(",")
+            if language.strip()
+        ]
+        self.ocr_threads = int(os.getenv("OPERATE_OCR_THREADS", "0")) or None
+        self.ocr_gpu = _env_flag("OPERATE_OCR_GPU", default=True)
+        self.ocr_warm_up = _env_flag("OPERATE_OCR_WARM_UP", default=True)
+        self.ocr_speculative = _env_flag("OPERATE_OCR_SPECULATIVE")
+        self.grounding = os.getenv("OPERATE_GROUNDING", "ocr")
+        self.vision_workers = int(os.getenv("OPERATE_VISION_WORKERS", "1"))
+        self.detector_weights = os.getenv("OPERATE_DETECTOR_WEIGHTS")
+        self.yolo_threads = int(os.getenv("OPERATE_YOLO_THREADS", "0")) or None
+        self.detection_tracking = _env_flag("OPERATE_DETECTION_TRACKING")
+        self.detection_padding = int(os.getenv("OPERATE_DETECTION_PADDING", "64"))
+        self.som_mode = os.getenv("OPERATE_SOM_MODE", "pixels")
+        self.som_ocr_text = _env_flag("OPERATE_SOM_OCR_TEXT")
+        self.label_suppression = os.getenv("OPERATE_LABEL_SUPPRESSION", "overlap")
+        self.label_iou_threshold = float(os.getenv("OPERATE_LABEL_IOU", "0.5"))
+        self.ocr_scale = float(os.getenv("OPERATE_OCR_SCALE", "1"))
+        self.ocr_grayscale = _env_flag("OPERATE_OCR_GRAYSCALE")
+        self.ocr_tiles = _env_flag("OPERATE_OCR_TILES")
+        self.ocr_tile_size = int(os.getenv("OPERATE_OCR_TILE_SIZE", "512"))
+        self.ocr_cache_mb = int(os.getenv("OPERATE_OCR_CACHE_MB", "32"))
+        self.ocr_cache_dir = os.getenv("OPERATE_OCR_CACHE_DIR")
+        self.image_format = os.getenv("OPERATE_IMAGE_FORMAT")
+        self.image_quality = int(os.getenv("OPERATE_IMAGE_QUALITY", "0")) or None
+        self.image_max_side = int(os.getenv("OPERATE_IMAGE_MAX_SIDE", "0")) or None
+        self.image_grayscale = _env_flag("OPERATE_IMAGE_GRAYSCALE")
+        self.image_colors = int(os.getenv("OPERATE_IMAGE_COLORS", "0")) or None
+        self.change_notifications = os.getenv("OPERATE_CHANGE_NOTIFICATIONS", "auto")
+        self.unchanged_screen = os.getenv("OPERATE_UNCHANGED_SCREEN", "backoff")
+        self.unchanged_backoff_max = float(
+            os.getenv("OPERATE_UNCHANGED_BACKOFF_MAX", "4")
+        )
         self.openai_api_key = (
             None  # instance variables are backups in case saving to a `.env` fails
         )
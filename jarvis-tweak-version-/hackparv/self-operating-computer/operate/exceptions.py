@@ -12,4 +12,15 @@ class ModelNotRecognizedException(Exception):
         super().__init__(self.message)
 
     def __str__(self):
-        return f"{self.message} : {self.model} "
\ No newline at end of file
+        return f"{self.message} : {self.model} "
+
+class CaptureBackendError(Exception):
+    """Exception raised when a screen capture backend is unavailable or fails.
+
+    Attributes:
+        message -- explanation of the error
+    """
+
+    def __init__(self, message="Screen capture backend failed"):
+        self.message = message
+        super().__init__(self.message)
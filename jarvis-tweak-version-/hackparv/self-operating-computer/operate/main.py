@@ -32,6 +32,73 @@ def main_entry():
         action="store_true",
     )
     
+    # Keep each captured screenshot on disk for debugging
+    parser.add_argument(
+        "--save-screenshots",
+        help="Write every captured screenshot to the screenshots directory",
+        action="store_true",
+    )
+
+    # Choose how the screen is captured on Linux
+    parser.add_argument(
+        "--capture-backend",
+        help="Linux screen capture backend: auto (MIT-SHM when available), pil or xshm",
+        choices=["auto", "pil", "xshm"],
+        required=False,
+    )
+
+    # OCR engine used by the OCR-backed models
+    parser.add_argument(
+        "--ocr-engine",
+        help="OCR engine: easyocr (default), tesseract or onnx (CPU only, see requirements-ocr.txt)",
+        choices=["easyocr", "tesseract", "onnx"],
+        required=False,
+    )
+
+    # Run OCR in a worker process while the model request is in flight
+    parser.add_argument(
+        "--speculative-ocr",
+        help="Start OCR as soon as the screen is captured, in a worker process",
+        action="store_true",
+    )
+
+    # How the screen is sent to the model
+    parser.add_argument(
+        "--vision-mode",
+        help="How to send the screen: full, tiles (only the changed regions after the first step) or focus (thumbnail plus a full resolution crop)",
+        choices=["full", "tiles", "focus"],
+        required=False,
+    )
+
+    # How the labels of gpt-4-with-som reach the model
+    parser.add_argument(
+        "--som-mode",
+        help="gpt-4-with-som: labels drawn into a full size screenshot (pixels) or listed as text next to a small one (table)",
+        choices=["pixels", "table"],
+        required=False,
+    )
+
+    # Only capture the focused window or a fixed rectangle
+    parser.add_argument(
+        "--capture-region",
+        help='Part of the screen to capture: screen, window (the focused window) or "x,y,width,height"',
+        required=False,
+    )
+
+    # Sample the screen in the background instead of sleeping before each capture
+    parser.add_argument(
+        "--frame-grabber",
+        help="Capture frames on a background thread and use the latest stable one",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--grab-fps",
+        help="Sampling rate of the background frame grabber (default 10)",
+        type=float,
+        required=False,
+    )
+
     # Allow for direct input of prompt
     parser.add_argument(
         "--prompt",
@@ -101,7 +168,16 @@ def main_entry():
             args.model,
             terminal_prompt=args.prompt,
             voice_mode=args.voice,
-            verbose_mode=args.verbose
+            verbose_mode=args.verbose,
+            save_screenshots=args.save_screenshots,
+            capture_backend=args.capture_backend,
+            capture_region=args.capture_region,
+            vision_mode=args.vision_mode,
+            speculative_ocr=args.speculative_ocr,
+            ocr_engine=args.ocr_engine,
+            som_mode=args.som_mode,
+            frame_grabber=args.frame_grabber,
+            grab_fps=args.grab_fps,
         )
     except KeyboardInterrupt:
         print(f"\n{ANSI_BRIGHT_MAGENTA}Exiting...")
@@ -1,90 +1,541 @@
-import base64
-import io
+import asyncio
 import json
-import os
 import time
 import traceback
+from dataclasses import replace
 
-import easyocr
 import ollama
-import pkg_resources
-from PIL import Image
-from ultralytics import YOLO
+import pyautogui
 
 from operate.config import Config
 from operate.exceptions import ModelNotRecognizedException
+from operate.models.detector import get_weights_path
 from operate.models.prompts import (
     get_system_prompt,
     get_user_first_message_prompt,
     get_user_prompt,
+    get_user_changed_tiles_prompt,
+    get_user_focus_prompt,
+    get_user_grounding_prompt,
+    get_user_label_table_prompt,
+    get_user_unchanged_screen_prompt,
 )
 from operate.utils.label import (
     add_labels,
     get_click_position_in_percent,
     get_label_coordinates,
+    label_boxes,
+    label_table,
 )
-from operate.utils.ocr import get_text_coordinates, get_text_element
-from operate.utils.screenshot import capture_screen_with_cursor, compress_screenshot
+from operate.utils.change import ChangeTracker, dirty_tile_counts, merge_tiles
+from operate.utils.encoding import encode_frame, get_profile
+from operate.utils.grounding import GroundingIndex
+from operate.utils.misc import convert_percent_to_decimal
+from operate.utils.ocr import get_ocr_service, get_text_coordinates, get_text_element
+from operate.utils.screenshot import (
+    capture_settled_frame,
+    damage_since,
+    save_debug_screenshot,
+)
+from operate.utils.tracking import DetectionTracker
 from operate.utils.style import ANSI_BRIGHT_MAGENTA, ANSI_GREEN, ANSI_RED, ANSI_RESET
+from operate.utils.workers import (
+    get_process_pool,
+    load_detector,
+    load_ocr_engine,
+    run_in_worker,
+    yolo_detect,
+)
 from operate.models.assistant_adapter import call_assistant_with_vision
 
 # Load configuration
 config = Config()
 
+# Models that locate click targets by running OCR on the screenshot
+OCR_MODELS = ("gpt-4-with-ocr", "gpt-4.1-with-ocr", "o1-with-ocr", "claude-3", "qwen-vl")
+
+# Remembers the previous step's frame to notice actions without visible effect
+screen_tracker = ChangeTracker()
+# The last frame the model received in full, or caught up to with tiles
+sent_frames = ChangeTracker()
+# Screen positions, as fractions, the "focus" vision mode can zoom into
+focus_points = {"zoom": None, "click": None, "zoom_pending": False}
+# YOLO detections of the previous step, see `config.detection_tracking`
+detection_tracker = DetectionTracker()
+
 
 async def get_next_action(model, messages, objective, session_id):
     if config.verbose:
         print("[Self-Operating Computer][get_next_action]")
         print("[Self-Operating Computer][get_next_action] model", model)
+    if model == "agent-1":
+        return "coming soon"
+
+    # capture may sleep while waiting for the screen to settle
+    frame = await asyncio.to_thread(capture_step_frame)
+    if uses_ocr(model):
+        # no-op unless speculative OCR is enabled
+        get_ocr_service().start(frame)
+    operations, session_id = await call_model(model, messages, objective, frame)
+    operations = map_operations_to_screen(operations, frame)
+    remember_focus_points(operations)
+    return operations, session_id
+
+
+async def call_model(model, messages, objective, frame):
     if model == "gpt-4":
-        return call_gpt_4o(messages), None
+        return await asyncio.to_thread(call_gpt_4o, messages, frame), None
     if model == "qwen-vl":
-        operation = await call_qwen_vl_with_ocr(messages, objective, model)
+        operation = await call_qwen_vl_with_ocr(messages, objective, model, frame)
         return operation, None
     if model == "gpt-4-with-som":
-        operation = await call_gpt_4o_labeled(messages, objective, model)
+        operation = await call_gpt_4o_labeled(messages, objective, model, frame)
         return operation, None
     if model == "gpt-4-with-ocr":
-        operation = await call_gpt_4o_with_ocr(messages, objective, model)
+        operation = await call_gpt_4o_with_ocr(messages, objective, model, frame)
         return operation, None
     if model == "gpt-4.1-with-ocr":
-        operation = await call_gpt_4_1_with_ocr(messages, objective, model)
+        operation = await call_gpt_4_1_with_ocr(messages, objective, model, frame)
         return operation, None
     if model == "o1-with-ocr":
-        operation = await call_o1_with_ocr(messages, objective, model)
+        operation = await call_o1_with_ocr(messages, objective, model, frame)
         return operation, None
-    if model == "agent-1":
-        return "coming soon"
     if model == "gemini-pro-vision":
-        return call_gemini_pro_vision(messages, objective), None
+        return (
+            await asyncio.to_thread(call_gemini_pro_vision, messages, objective, frame),
+            None,
+        )
     if model == "llava" or model.startswith("ollama"):
-        operation = call_ollama_model(messages, model)
+        operation = await asyncio.to_thread(call_ollama_model, messages, model, frame)
         return operation, None
     if model == "claude-3":
-        operation = await call_claude_3_with_ocr(messages, objective, model)
+        operation = await call_claude_3_with_ocr(messages, objective, model, frame)
         return operation, None
     if model == "assistant":
-        operation = await call_assistant_with_vision(messages, objective, model)
+        operation = await call_assistant_with_vision(messages, objective, model, frame)
         return operation, None
     raise ModelNotRecognizedException(model)
 
 
-def call_gpt_4o(messages):
+def uses_ocr(model):
+    """Whether `model` reads the screen with OCR, to warm up and start it early."""
+    if model == "gpt-4-with-som":
+        return config.som_mode == "table" and config.som_ocr_text
+    return model in OCR_MODELS
+
+
+def uses_detector(model):
+    """Whether `model` runs YOLO, to load it early."""
+    if model in OCR_MODELS:
+        return config.grounding == "hybrid"
+    return model == "gpt-4-with-som"
+
+
+def start_vision_workers(model):
+    """
+    Start the worker processes that run vision inference for `model`, and
+    have each of them load the model it needs before the first step. OCR and
+    YOLO get separate pools, so they run at the same time.
+    Does nothing when `config.vision_workers` is 0.
+    """
+    if not config.vision_workers:
+        return
+    if uses_ocr(model):
+        get_process_pool(
+            "ocr",
+            config.vision_workers,
+            [(load_ocr_engine, get_ocr_service().engine_args)],
+        )
+    if uses_detector(model):
+        get_process_pool(
+            "detector",
+            config.vision_workers,
+            [(load_detector, (get_detector_weights(), config.yolo_threads))],
+        )
+
+
+def get_detector_weights():
+    """The detector model to use: `config.detector_weights` or the shipped `best.pt`."""
+    return config.detector_weights or get_weights_path()
+
+
+async def detect_elements(frame, region=None):
+    """
+    YOLO boxes ``(x1, y1, x2, y2)`` of the UI elements on `frame`, or only
+    within its `region`, detected in a worker process (or on a thread with
+    `config.vision_workers` at 0) by the resident model.
+    """
+    pixels = frame.pixels
+    x1, y1 = 0, 0
+    if region is not None:
+        x1, y1, x2, y2 = region
+        pixels = pixels[y1:y2, x1:x2]
+    args = (get_detector_weights(), pixels, config.yolo_threads)
+    if config.vision_workers:
+        boxes = await run_in_worker("detector", yolo_detect, *args)
+    else:
+        boxes = await asyncio.to_thread(yolo_detect, *args)
+    return [[bx1 + x1, by1 + y1, bx2 + x1, by2 + y1] for bx1, by1, bx2, by2 in boxes]
+
+
+async def detect_label_boxes(frame):
+    """The ``(boxes, ids)`` to label on `frame`, ids being None without tracking."""
+    if config.detection_tracking:
+        return await detect_tracked_elements(frame)
+    return await detect_elements(frame), None
+
+
+async def detect_tracked_elements(frame):
+    """
+    Detections of `frame` as ``(boxes, ids)``, running YOLO only on the
+    regions that changed since the previous step and keeping the other
+    boxes, with ids that stay stable while an element is on screen.
+    """
+    detection_tracker.tile_size = config.tile_size
+    detection_tracker.padding = config.detection_padding
+    crops = detection_tracker.plan(frame)
+    if crops is None:
+        tracks = detection_tracker.update(frame, await detect_elements(frame))
+    else:
+        # crops run concurrently when there are several workers
+        results = await asyncio.gather(
+            *(detect_elements(frame, crop) for crop in crops)
+        )
+        boxes = [box for result in results for box in result]
+        tracks = detection_tracker.update(frame, boxes, crops)
+    if config.verbose:
+        print(
+            "[detect_tracked_elements]",
+            "whole frame" if crops is None else f"{len(crops)} changed regions",
+            len(tracks),
+            "elements",
+        )
+    return [track.box for track in tracks], [track.id for track in tracks]
+
+
+async def get_frame_labels(frame):
+    """The ``{"~N": box}`` labels of the detections on `frame`, detected once per frame."""
+    labels = frame.cache.get("labels")
+    if labels is None:
+        boxes, ids = await detect_label_boxes(frame)
+        labels = label_boxes(
+            boxes, config.label_suppression, config.label_iou_threshold, ids
+        )
+        frame.cache["labels"] = labels
+    return labels
+
+
+async def get_grounding_prompt(frame):
+    """
+    The detected elements a click may name by label, for `config.grounding`
+    "hybrid". Only waits for YOLO, the speculative OCR of `frame` keeps
+    running and is collected by `locate_click_target`.
+    """
+    labels = await get_frame_labels(frame)
+    return get_user_grounding_prompt(label_table(labels, frame.size))
+
+
+async def locate_click_target(operation, frame):
+    """
+    Resolve a click `operation` of an OCR model on `frame` and return the
+    index of the OCR element it names (None when found another way) and its
+    center as ``{"x", "y"}`` fractions of the frame.
+
+    With `config.grounding` "hybrid", the OCR results and the YOLO detections
+    of the frame are fused in a `GroundingIndex`, so the click may name a
+    label and a text OCR alone cannot match is looked for in the detected
+    controls, before giving up and asking the fallback model.
+    """
+    result = await get_ocr_service().read_frame_async(frame)
+    if config.grounding != "hybrid":
+        index = get_text_element(result, operation.get("text"), frame)
+        return index, get_text_coordinates(result, index, frame)
+
+    grounding = frame.cache.get("grounding")
+    if grounding is None or grounding.ocr_result is not result:
+        grounding = GroundingIndex(result, await get_frame_labels(frame))
+        frame.cache["grounding"] = grounding
+    box = grounding.locate(operation.get("text"), operation.get("label"))
+    if box is None:
+        raise Exception("The click target was not found in the image")
+    if config.verbose:
+        print(
+            "[locate_click_target]",
+            grounding.describe(operation.get("text"), operation.get("label")),
+            "at",
+            box,
+        )
+    width, height = frame.size
+    return None, {
+        "x": round((box[0] + box[2]) / 2 / width, 3),
+        "y": round((box[1] + box[3]) / 2 / height, 3),
+    }
+
+
+def capture_step_frame():
+    """
+    Capture the frame for this agent step and flag it as `unchanged` when it
+    looks the same as the previous step's frame.
+
+    With `config.unchanged_screen == "backoff"`, an unchanged screen is
+    re-captured after exponentially growing waits (up to
+    `config.unchanged_backoff_max` seconds in total) before it is accepted.
+    """
+    frame = capture_settled_frame()
+    change = compare_with_previous_step(frame)
+
+    if config.unchanged_screen == "backoff":
+        delay, waited = 0.5, 0.0
+        while (
+            change is not None
+            and not change.changed
+            and waited + delay <= config.unchanged_backoff_max
+        ):
+            if config.verbose:
+                print("[capture_step_frame] screen unchanged, backing off", delay)
+            time.sleep(delay)
+            waited += delay
+            delay *= 2
+            frame = capture_settled_frame()
+            change = compare_with_previous_step(frame)
+
+    frame.unchanged = change is not None and not change.changed
+    if config.verbose and change is not None:
+        print(
+            "[capture_step_frame] hash_distance",
+            change.hash_distance,
+            "changed_pixels",
+            change.changed_pixels,
+            "dirty regions",
+            len(change.regions),
+        )
+
+    screen_tracker.remember(frame)
+    return frame
+
+
+def compare_with_previous_step(frame):
+    previous = screen_tracker.previous
+    damage = damage_since(previous.timestamp) if previous is not None else None
+    return screen_tracker.compare(frame, damage=damage)
+
+
+def map_operations_to_screen(operations, frame):
+    """
+    Click positions come back as fractions of the image the model saw. When
+    only a window or region was captured, map them to fractions of the whole
+    screen for `OperatingSystem.click_at_percentage`.
+    """
+    if not frame.is_cropped or not isinstance(operations, list):
+        return operations
+    for operation in operations:
+        if not isinstance(operation, dict):
+            continue
+        if str(operation.get("operation", "")).lower() not in ("click", "zoom"):
+            continue
+        if operation.get("x") is None or operation.get("y") is None:
+            continue
+        x = convert_percent_to_decimal(operation.get("x"))
+        y = convert_percent_to_decimal(operation.get("y"))
+        if x is None or y is None:
+            continue
+        x, y = frame.to_screen(x, y)
+        operation["x"], operation["y"] = round(x, 3), round(y, 3)
+        if config.verbose:
+            print("[map_operations_to_screen] click mapped to", operation["x"], operation["y"])
+    return operations
+
+
+def remember_focus_points(operations):
+    """Track the last click and zoom request for the "focus" vision mode."""
+    if not isinstance(operations, list):
+        return
+    for operation in operations:
+        if not isinstance(operation, dict):
+            continue
+        operate_type = str(operation.get("operation", "")).lower()
+        if operate_type not in ("click", "zoom"):
+            continue
+        try:
+            point = (float(operation["x"]), float(operation["y"]))
+        except (KeyError, TypeError, ValueError):
+            continue
+        if operate_type == "zoom":
+            focus_points["zoom"] = point
+            focus_points["zoom_pending"] = True
+        else:
+            focus_points["click"] = point
+            # a click means the model found what it zoomed in for
+            focus_points["zoom"] = None
+
+
+def get_focus_point():
+    """
+    Where the "focus" vision mode should look, as fractions of the screen:
+    the area the model asked to zoom into, else the last click, else the cursor.
+    """
+    if focus_points["zoom"] is not None:
+        return focus_points["zoom"]
+    if focus_points["click"] is not None:
+        return focus_points["click"]
+    x, y = pyautogui.position()
+    width, height = pyautogui.size()
+    return x / width, y / height
+
+
+def skip_screenshot(frame):
+    """
+    Whether this step should re-prompt with a text-only "no change" note
+    instead of sending the screenshot again. Only used by providers that keep
+    the previous screenshots in the conversation history. A zoom request is
+    always answered with a screenshot, although zooming changes nothing on screen.
+    """
+    if config.vision_mode == "focus" and focus_points["zoom_pending"]:
+        return False
+    return frame.unchanged and config.unchanged_screen != "send"
+
+
+def text_part(text, provider):
+    return {"type": "text", "text": text}
+
+
+def image_part(image, provider):
+    if provider == "anthropic":
+        return {
+            "type": "image",
+            "source": {
+                "type": "base64",
+                "media_type": image.media_type,
+                "data": image.base64,
+            },
+        }
+    return {"type": "image_url", "image_url": {"url": image.data_url}}
+
+
+def get_vision_content(frame, text, provider, first_step=False):
+    """
+    Build the content of the user message carrying the screen for OpenAI-style
+    and Anthropic providers, following `config.vision_mode`:
+
+    - "full": the whole frame.
+    - "tiles": after the first step, only the regions that changed since the
+      last frame the model saw, plus a small thumbnail of the whole screen.
+      Falls back to the whole frame when too much changed.
+    - "focus": a small thumbnail of the whole screen plus a full resolution
+      crop around the focus point (see `get_focus_point`).
+    """
+    content = None
+    if config.vision_mode == "tiles" and not first_step:
+        content = get_changed_tiles_content(frame, text, provider)
+    elif config.vision_mode == "focus":
+        content = get_focus_content(frame, text, provider)
+    if content is None:
+        content = [
+            text_part(text, provider),
+            image_part(encode_frame(frame, provider), provider),
+        ]
+    sent_frames.remember(frame)
+
+    if provider == "anthropic":
+        # Claude works best with the images before the text
+        content = content[1:] + content[:1]
+    return content
+
+
+def get_thumbnail_profile(provider):
+    return replace(
+        get_profile(provider),
+        max_size=(config.thumbnail_size, config.thumbnail_size),
+    )
+
+
+def get_focus_content(frame, text, provider):
+    x, y = frame.from_screen(*get_focus_point())
+    focus_points["zoom_pending"] = False
+    size = config.focus_size
+    if frame.width <= size and frame.height <= size:
+        return None
+
+    # Center a crop of `size` pixels on the point, shifted to stay inside the frame
+    x1 = min(max(0, int(x * frame.width) - size // 2), max(0, frame.width - size))
+    y1 = min(max(0, int(y * frame.height) - size // 2), max(0, frame.height - size))
+    box = (x1, y1, min(frame.width, x1 + size), min(frame.height, y1 + size))
+    region = (
+        box[0] / frame.width,
+        box[1] / frame.height,
+        box[2] / frame.width,
+        box[3] / frame.height,
+    )
+    if config.verbose:
+        print("[get_focus_content] focus crop", box)
+
+    # The crop is sent at native resolution, whatever the provider's budget
+    crop_profile = replace(
+        get_profile(provider), max_size=None, max_pixels=None, max_short_side=None
+    )
+    return [
+        text_part(text + get_user_focus_prompt(region), provider),
+        image_part(encode_frame(frame, provider, get_thumbnail_profile(provider)), provider),
+        image_part(encode_frame(frame.crop(box), provider, crop_profile), provider),
+    ]
+
+
+def get_changed_tiles_content(frame, text, provider):
+    previous = sent_frames.previous
+    if previous is None or previous.size != frame.size:
+        return None
+
+    tile_size = config.tile_size
+    counts = dirty_tile_counts(previous.pixels, frame.pixels, tile_size)
+    boxes = merge_tiles(counts > 0, tile_size, frame.size)
+    if not boxes:
+        return None
+    area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in boxes)
+    if area > config.tiles_max_fraction * frame.width * frame.height:
+        if config.verbose:
+            print("[get_changed_tiles_content] too much changed, sending the full frame")
+        return None
+
+    regions = [
+        (x1 / frame.width, y1 / frame.height, x2 / frame.width, y2 / frame.height)
+        for x1, y1, x2, y2 in boxes
+    ]
+    if config.verbose:
+        print(
+            "[get_changed_tiles_content] sending",
+            len(boxes),
+            "changed regions covering",
+            round(100 * area / (frame.width * frame.height), 1),
+            "% of the screen",
+        )
+
+    content = [
+        text_part(text + get_user_changed_tiles_prompt(regions), provider),
+        image_part(encode_frame(frame, provider, get_thumbnail_profile(provider)), provider),
+    ]
+    for box in boxes:
+        content.append(image_part(encode_frame(frame.crop(box), provider), provider))
+    return content
+
+
+def get_unchanged_screen_message(user_prompt):
+    if config.verbose:
+        print("[get_unchanged_screen_message] screen unchanged, not sending a screenshot")
+    return {
+        "role": "user",
+        "content": get_user_unchanged_screen_prompt() + user_prompt,
+    }
+
+
+def call_gpt_4o(messages, frame=None):
     if config.verbose:
         print("[call_gpt_4_v]")
-    time.sleep(1)
     client = config.initialize_openai()
     try:
-        screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
-
-        screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
         # Call the function to capture the screen with the cursor
-        capture_screen_with_cursor(screenshot_filename)
-
-        with open(screenshot_filename, "rb") as img_file:
-            img_base64 = base64.b64encode(img_file.read()).decode("utf-8")
+        if frame is None:
+            frame = capture_settled_frame()
+        save_debug_screenshot(frame)
 
         if len(messages) == 1:
             user_prompt = get_user_first_message_prompt()
@@ -97,16 +548,15 @@ def call_gpt_4o(messages):
                 user_prompt,
             )
 
-        vision_message = {
-            "role": "user",
-            "content": [
-                {"type": "text", "text": user_prompt},
-                {
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{img_base64}"},
-                },
-            ],
-        }
+        if skip_screenshot(frame):
+            vision_message = get_unchanged_screen_message(user_prompt)
+        else:
+            vision_message = {
+                "role": "user",
+                "content": get_vision_content(
+                    frame, user_prompt, "openai", first_step=len(messages) == 1
+                ),
+            }
         messages.append(vision_message)
 
         response = client.chat.completions.create(
@@ -143,53 +593,49 @@ def call_gpt_4o(messages):
         )
         if config.verbose:
             traceback.print_exc()
-        return call_gpt_4o(messages)
+        return call_gpt_4o(messages, frame)
 
 
-async def call_qwen_vl_with_ocr(messages, objective, model):
+async def call_qwen_vl_with_ocr(messages, objective, model, frame=None):
     if config.verbose:
         print("[call_qwen_vl_with_ocr]")
 
     # Construct the path to the file within the package
     try:
-        time.sleep(1)
         client = config.initialize_qwen()
 
         confirm_system_prompt(messages, objective, model)
-        screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
-
         # Call the function to capture the screen with the cursor
-        raw_screenshot_filename = os.path.join(screenshots_dir, "raw_screenshot.png")
-        capture_screen_with_cursor(raw_screenshot_filename)
-
-        # Compress screenshot image to make size be smaller
-        screenshot_filename = os.path.join(screenshots_dir, "screenshot.jpeg")
-        compress_screenshot(raw_screenshot_filename, screenshot_filename)
-
-        with open(screenshot_filename, "rb") as img_file:
-            img_base64 = base64.b64encode(img_file.read()).decode("utf-8")
+        if frame is None:
+            frame = await asyncio.to_thread(capture_settled_frame)
+        await asyncio.to_thread(save_debug_screenshot, frame, "screenshot.jpeg")
 
         if len(messages) == 1:
             user_prompt = get_user_first_message_prompt()
         else:
             user_prompt = get_user_prompt()
+        if config.grounding == "hybrid":
+            user_prompt = await get_grounding_prompt(frame) + user_prompt
 
-        vision_message = {
-            "role": "user",
-            "content": [
-                {"type": "text",
-                 "text": f"{user_prompt}**REMEMBER** Only output json format, do not append any other text."},
-                {
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{img_base64}"},
-                },
-            ],
-        }
+        if skip_screenshot(frame):
+            vision_message = get_unchanged_screen_message(
+                f"{user_prompt}**REMEMBER** Only output json format, do not append any other text."
+            )
+        else:
+            vision_message = {
+                "role": "user",
+                "content": await asyncio.to_thread(
+                    get_vision_content,
+                    frame,
+                    f"{user_prompt}**REMEMBER** Only output json format, do not append any other text.",
+                    "qwen",
+                    first_step=len(messages) == 1,
+                ),
+            }
         messages.append(vision_message)
 
-        response = client.chat.completions.create(
+        response = await asyncio.to_thread(
+            client.chat.completions.create,
             model="qwen2.5-vl-72b-instruct",
             messages=messages,
         )
@@ -213,17 +659,8 @@ async def call_qwen_vl_with_ocr(messages, objective, model):
                         "[call_qwen_vl_with_ocr][click] text_to_click",
                         text_to_click,
                     )
-                # Initialize EasyOCR Reader
-                reader = easyocr.Reader(["en"])
-
-                # Read the screenshot
-                result = reader.readtext(screenshot_filename)
-
-                text_element_index = get_text_element(
-                    result, text_to_click, screenshot_filename
-                )
-                coordinates = get_text_coordinates(
-                    result, text_element_index, screenshot_filename
+                text_element_index, coordinates = await locate_click_target(
+                    operation, frame
                 )
 
                 # add `coordinates`` to `content`
@@ -261,9 +698,9 @@ async def call_qwen_vl_with_ocr(messages, objective, model):
         if config.verbose:
             print("[Self-Operating Computer][Operate] error", e)
             traceback.print_exc()
-        return gpt_4_fallback(messages, objective, model)
+        return await asyncio.to_thread(gpt_4_fallback, messages, objective, model, frame)
 
-def call_gemini_pro_vision(messages, objective):
+def call_gemini_pro_vision(messages, objective, frame=None):
     """
     Get the next action for Self-Operating Computer using Gemini Pro Vision
     """
@@ -271,25 +708,21 @@ def call_gemini_pro_vision(messages, objective):
         print(
             "[Self Operating Computer][call_gemini_pro_vision]",
         )
-    # sleep for a second
-    time.sleep(1)
     try:
-        screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
-
-        screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
         # Call the function to capture the screen with the cursor
-        capture_screen_with_cursor(screenshot_filename)
-        # sleep for a second
-        time.sleep(1)
+        if frame is None:
+            frame = capture_settled_frame()
+        save_debug_screenshot(frame)
         prompt = get_system_prompt("gemini-pro-vision", objective)
 
         model = config.initialize_google()
         if config.verbose:
             print("[call_gemini_pro_vision] model", model)
 
-        response = model.generate_content([prompt, Image.open(screenshot_filename)])
+        image = encode_frame(frame, "gemini")
+        response = model.generate_content(
+            [prompt, {"mime_type": image.media_type, "data": image.data}]
+        )
 
         content = response.text[1:]
         if config.verbose:
@@ -312,48 +745,44 @@ def call_gemini_pro_vision(messages, objective):
         if config.verbose:
             print("[Self-Operating Computer][Operate] error", e)
             traceback.print_exc()
-        return call_gpt_4o(messages)
+        return call_gpt_4o(messages, frame)
 
 
-async def call_gpt_4o_with_ocr(messages, objective, model):
+async def call_gpt_4o_with_ocr(messages, objective, model, frame=None):
     if config.verbose:
         print("[call_gpt_4o_with_ocr]")
 
     # Construct the path to the file within the package
     try:
-        time.sleep(1)
         client = config.initialize_openai()
 
         confirm_system_prompt(messages, objective, model)
-        screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
-
-        screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
         # Call the function to capture the screen with the cursor
-        capture_screen_with_cursor(screenshot_filename)
-
-        with open(screenshot_filename, "rb") as img_file:
-            img_base64 = base64.b64encode(img_file.read()).decode("utf-8")
+        if frame is None:
+            frame = await asyncio.to_thread(capture_settled_frame)
+        await asyncio.to_thread(save_debug_screenshot, frame)
 
         if len(messages) == 1:
             user_prompt = get_user_first_message_prompt()
         else:
             user_prompt = get_user_prompt()
+        if config.grounding == "hybrid":
+            user_prompt = await get_grounding_prompt(frame) + user_prompt
 
-        vision_message = {
-            "role": "user",
-            "content": [
-                {"type": "text", "text": user_prompt},
-                {
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{img_base64}"},
-                },
-            ],
-        }
+        if skip_screenshot(frame):
+            vision_message = get_unchanged_screen_message(user_prompt)
+        else:
+            vision_message = {
+                "role": "user",
+                "content": await asyncio.to_thread(
+                    get_vision_content,
+                    frame, user_prompt, "openai", first_step=len(messages) == 1
+                ),
+            }
         messages.append(vision_message)
 
-        response = client.chat.completions.create(
+        response = await asyncio.to_thread(
+            client.chat.completions.create,
             model="gpt-4o",
             messages=messages,
         )
@@ -377,17 +806,8 @@ async def call_gpt_4o_with_ocr(messages, objective, model):
                         "[call_gpt_4o_with_ocr][click] text_to_click",
                         text_to_click,
                     )
-                # Initialize EasyOCR Reader
-                reader = easyocr.Reader(["en"])
-
-                # Read the screenshot
-                result = reader.readtext(screenshot_filename)
-
-                text_element_index = get_text_element(
-                    result, text_to_click, screenshot_filename
-                )
-                coordinates = get_text_coordinates(
-                    result, text_element_index, screenshot_filename
+                text_element_index, coordinates = await locate_click_target(
+                    operation, frame
                 )
 
                 # add `coordinates`` to `content`
@@ -425,46 +845,42 @@ async def call_gpt_4o_with_ocr(messages, objective, model):
         if config.verbose:
             print("[Self-Operating Computer][Operate] error", e)
             traceback.print_exc()
-        return gpt_4_fallback(messages, objective, model)
+        return await asyncio.to_thread(gpt_4_fallback, messages, objective, model, frame)
 
 
-async def call_gpt_4_1_with_ocr(messages, objective, model):
+async def call_gpt_4_1_with_ocr(messages, objective, model, frame=None):
     if config.verbose:
         print("[call_gpt_4_1_with_ocr]")
 
     try:
-        time.sleep(1)
         client = config.initialize_openai()
 
         confirm_system_prompt(messages, objective, model)
-        screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
-
-        screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
-        capture_screen_with_cursor(screenshot_filename)
-
-        with open(screenshot_filename, "rb") as img_file:
-            img_base64 = base64.b64encode(img_file.read()).decode("utf-8")
+        if frame is None:
+            frame = await asyncio.to_thread(capture_settled_frame)
+        await asyncio.to_thread(save_debug_screenshot, frame)
 
         if len(messages) == 1:
             user_prompt = get_user_first_message_prompt()
         else:
             user_prompt = get_user_prompt()
+        if config.grounding == "hybrid":
+            user_prompt = await get_grounding_prompt(frame) + user_prompt
 
-        vision_message = {
-            "role": "user",
-            "content": [
-                {"type": "text", "text": user_prompt},
-                {
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{img_base64}"},
-                },
-            ],
-        }
+        if skip_screenshot(frame):
+            vision_message = get_unchanged_screen_message(user_prompt)
+        else:
+            vision_message = {
+                "role": "user",
+                "content": await asyncio.to_thread(
+                    get_vision_content,
+                    frame, user_prompt, "openai", first_step=len(messages) == 1
+                ),
+            }
         messages.append(vision_message)
 
-        response = client.chat.completions.create(
+        response = await asyncio.to_thread(
+            client.chat.completions.create,
             model="gpt-4.1",
             messages=messages,
         )
@@ -487,15 +903,8 @@ async def call_gpt_4_1_with_ocr(messages, objective, model):
                         "[call_gpt_4_1_with_ocr][click] text_to_click",
                         text_to_click,
                     )
-                reader = easyocr.Reader(["en"])
-
-                result = reader.readtext(screenshot_filename)
-
-                text_element_index = get_text_element(
-                    result, text_to_click, screenshot_filename
-                )
-                coordinates = get_text_coordinates(
-                    result, text_element_index, screenshot_filename
+                text_element_index, coordinates = await locate_click_target(
+                    operation, frame
                 )
 
                 operation["x"] = coordinates["x"]
@@ -531,48 +940,44 @@ async def call_gpt_4_1_with_ocr(messages, objective, model):
         if config.verbose:
             print("[Self-Operating Computer][Operate] error", e)
             traceback.print_exc()
-        return gpt_4_fallback(messages, objective, model)
+        return await asyncio.to_thread(gpt_4_fallback, messages, objective, model, frame)
 
 
-async def call_o1_with_ocr(messages, objective, model):
+async def call_o1_with_ocr(messages, objective, model, frame=None):
     if config.verbose:
         print("[call_o1_with_ocr]")
 
     # Construct the path to the file within the package
     try:
-        time.sleep(1)
         client = config.initialize_openai()
 
         confirm_system_prompt(messages, objective, model)
-        screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
-
-        screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
         # Call the function to capture the screen with the cursor
-        capture_screen_with_cursor(screenshot_filename)
-
-        with open(screenshot_filename, "rb") as img_file:
-            img_base64 = base64.b64encode(img_file.read()).decode("utf-8")
+        if frame is None:
+            frame = await asyncio.to_thread(capture_settled_frame)
+        await asyncio.to_thread(save_debug_screenshot, frame)
 
         if len(messages) == 1:
             user_prompt = get_user_first_message_prompt()
         else:
             user_prompt = get_user_prompt()
+        if config.grounding == "hybrid":
+            user_prompt = await get_grounding_prompt(frame) + user_prompt
 
-        vision_message = {
-            "role": "user",
-            "content": [
-                {"type": "text", "text": user_prompt},
-                {
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{img_base64}"},
-                },
-            ],
-        }
+        if skip_screenshot(frame):
+            vision_message = get_unchanged_screen_message(user_prompt)
+        else:
+            vision_message = {
+                "role": "user",
+                "content": await asyncio.to_thread(
+                    get_vision_content,
+                    frame, user_prompt, "openai", first_step=len(messages) == 1
+                ),
+            }
         messages.append(vision_message)
 
-        response = client.chat.completions.create(
+        response = await asyncio.to_thread(
+            client.chat.completions.create,
             model="o1",
             messages=messages,
         )
@@ -596,17 +1001,8 @@ async def call_o1_with_ocr(messages, objective, model):
                         "[call_o1_with_ocr][click] text_to_click",
                         text_to_click,
                     )
-                # Initialize EasyOCR Reader
-                reader = easyocr.Reader(["en"])
-
-                # Read the screenshot
-                result = reader.readtext(screenshot_filename)
-
-                text_element_index = get_text_element(
-                    result, text_to_click, screenshot_filename
-                )
-                coordinates = get_text_coordinates(
-                    result, text_element_index, screenshot_filename
+                text_element_index, coordinates = await locate_click_target(
+                    operation, frame
                 )
 
                 # add `coordinates`` to `content`
@@ -644,30 +1040,37 @@ async def call_o1_with_ocr(messages, objective, model):
         if config.verbose:
             print("[Self-Operating Computer][Operate] error", e)
             traceback.print_exc()
-        return gpt_4_fallback(messages, objective, model)
-
+        return await asyncio.to_thread(gpt_4_fallback, messages, objective, model, frame)
 
-async def call_gpt_4o_labeled(messages, objective, model):
-    time.sleep(1)
 
+async def call_gpt_4o_labeled(messages, objective, model, frame=None):
     try:
         client = config.initialize_openai()
 
         confirm_system_prompt(messages, objective, model)
-        file_path = pkg_resources.resource_filename("operate.models.weights", "best.pt")
-        yolo_model = YOLO(file_path)  # Load your trained model
-        screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
-
-        screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
         # Call the function to capture the screen with the cursor
-        capture_screen_with_cursor(screenshot_filename)
-
-        with open(screenshot_filename, "rb") as img_file:
-            img_base64 = base64.b64encode(img_file.read()).decode("utf-8")
-
-        img_base64_labeled, label_coordinates = add_labels(img_base64, yolo_model)
+        if frame is None:
+            frame = await asyncio.to_thread(capture_settled_frame)
+        await asyncio.to_thread(save_debug_screenshot, frame)
+
+        if uses_ocr(model):
+            # the OCR text of the label table, read while YOLO runs
+            (boxes, ids), ocr_result = await asyncio.gather(
+                detect_label_boxes(frame),
+                get_ocr_service().read_frame_async(frame),
+            )
+        else:
+            (boxes, ids), ocr_result = await detect_label_boxes(frame), None
+        labeled, label_coordinates = await asyncio.to_thread(
+            add_labels,
+            frame,
+            boxes,
+            config.label_suppression,
+            config.label_iou_threshold,
+            ids,
+            # the same switches as `save_debug_screenshot`
+            "labeled_images" if config.verbose or config.save_screenshots else None,
+        )
 
         if len(messages) == 1:
             user_prompt = get_user_first_message_prompt()
@@ -680,21 +1083,34 @@ async def call_gpt_4o_labeled(messages, objective, model):
                 user_prompt,
             )
 
-        vision_message = {
-            "role": "user",
-            "content": [
-                {"type": "text", "text": user_prompt},
-                {
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:image/jpeg;base64,{img_base64_labeled}"
-                    },
-                },
-            ],
-        }
+        if skip_screenshot(frame):
+            vision_message = get_unchanged_screen_message(user_prompt)
+        elif config.som_mode == "table":
+            # the labels travel as text, the image only has to show the layout
+            rows = label_table(label_coordinates, frame.size, ocr_result)
+            encoded = await asyncio.to_thread(
+                encode_frame, labeled, profile=get_thumbnail_profile("openai")
+            )
+            vision_message = {
+                "role": "user",
+                "content": [
+                    text_part(get_user_label_table_prompt(rows) + user_prompt, "openai"),
+                    image_part(encoded, "openai"),
+                ],
+            }
+        else:
+            encoded = await asyncio.to_thread(encode_frame, labeled, "openai")
+            vision_message = {
+                "role": "user",
+                "content": [
+                    text_part(user_prompt, "openai"),
+                    image_part(encoded, "openai"),
+                ],
+            }
         messages.append(vision_message)
 
-        response = client.chat.completions.create(
+        response = await asyncio.to_thread(
+            client.chat.completions.create,
             model="gpt-4o",
             messages=messages,
             presence_penalty=1,
@@ -737,12 +1153,8 @@ async def call_gpt_4o_labeled(messages, objective, model):
                         "[Self Operating Computer][call_gpt_4_vision_preview_labeled] coordinates",
                         coordinates,
                     )
-                image = Image.open(
-                    io.BytesIO(base64.b64decode(img_base64))
-                )  # Load the image to get its size
-                image_size = image.size  # Get the size of the image (width, height)
                 click_position_percent = get_click_position_in_percent(
-                    coordinates, image_size
+                    coordinates, frame.size
                 )
                 if config.verbose:
                     print(
@@ -753,7 +1165,7 @@ async def call_gpt_4o_labeled(messages, objective, model):
                     print(
                         f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_RED}[Error] Failed to get click position in percent. Trying another method {ANSI_RESET}"
                     )
-                    return call_gpt_4o(messages)
+                    return await asyncio.to_thread(call_gpt_4o, messages, frame)
 
                 x_percent = f"{click_position_percent[0]:.2f}"
                 y_percent = f"{click_position_percent[1]:.2f}"
@@ -788,10 +1200,10 @@ async def call_gpt_4o_labeled(messages, objective, model):
         if config.verbose:
             print("[Self-Operating Computer][Operate] error", e)
             traceback.print_exc()
-        return call_gpt_4o(messages)
+        return await asyncio.to_thread(call_gpt_4o, messages, frame)
 
 
-def call_ollama_model(messages, model_spec="llava"):
+def call_ollama_model(messages, model_spec="llava", frame=None):
     """
     Call Ollama with flexible model specification.
     
@@ -802,8 +1214,6 @@ def call_ollama_model(messages, model_spec="llava"):
     if config.verbose:
         print(f"[call_ollama_model] model_spec: {model_spec}")
     
-    time.sleep(1)
-    
     try:
         # Import here to avoid circular imports
         from operate.models.ollama_resolver import OllamaModelResolver
@@ -842,13 +1252,10 @@ def call_ollama_model(messages, model_spec="llava"):
         
         # Initialize Ollama client
         model_client = config.initialize_ollama()
-        screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
-
-        screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
         # Call the function to capture the screen with the cursor
-        capture_screen_with_cursor(screenshot_filename)
+        if frame is None:
+            frame = capture_settled_frame()
+        save_debug_screenshot(frame)
 
         if len(messages) == 1:
             user_prompt = get_user_first_message_prompt()
@@ -864,7 +1271,7 @@ def call_ollama_model(messages, model_spec="llava"):
         vision_message = {
             "role": "user",
             "content": user_prompt,
-            "images": [screenshot_filename],
+            "images": [encode_frame(frame, "ollama").base64],
         }
         messages.append(vision_message)
 
@@ -873,7 +1280,7 @@ def call_ollama_model(messages, model_spec="llava"):
             messages=messages,
         )
 
-        # Important: Remove the image path from the message history.
+        # Important: Remove the image from the message history.
         # Ollama will attempt to load each image reference and will
         # eventually timeout.
         messages[-1]["images"] = None
@@ -922,78 +1329,47 @@ def call_ollama_llava(messages):
     return call_ollama_model(messages, "llava")
 
 
-async def call_claude_3_with_ocr(messages, objective, model):
+async def call_claude_3_with_ocr(messages, objective, model, frame=None):
     if config.verbose:
         print("[call_claude_3_with_ocr]")
 
     try:
-        time.sleep(1)
         client = config.initialize_anthropic()
 
         confirm_system_prompt(messages, objective, model)
-        screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
-
-        screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
-        capture_screen_with_cursor(screenshot_filename)
-
-        # downsize screenshot due to 5MB size limit
-        with open(screenshot_filename, "rb") as img_file:
-            img = Image.open(img_file)
-
-            # Convert RGBA to RGB
-            if img.mode == "RGBA":
-                img = img.convert("RGB")
-
-            # Calculate the new dimensions while maintaining the aspect ratio
-            original_width, original_height = img.size
-            aspect_ratio = original_width / original_height
-            new_width = 2560  # Adjust this value to achieve the desired file size
-            new_height = int(new_width / aspect_ratio)
-            if config.verbose:
-                print("[call_claude_3_with_ocr] resizing claude")
-
-            # Resize the image
-            img_resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-            # Save the resized and converted image to a BytesIO object for JPEG format
-            img_buffer = io.BytesIO()
-            img_resized.save(
-                img_buffer, format="JPEG", quality=85
-            )  # Adjust the quality parameter as needed
-            img_buffer.seek(0)
-
-            # Encode the resized image as base64
-            img_data = base64.b64encode(img_buffer.getvalue()).decode("utf-8")
+        if frame is None:
+            frame = await asyncio.to_thread(capture_settled_frame)
+        await asyncio.to_thread(save_debug_screenshot, frame)
 
         if len(messages) == 1:
             user_prompt = get_user_first_message_prompt()
         else:
             user_prompt = get_user_prompt()
+        if config.grounding == "hybrid":
+            user_prompt = await get_grounding_prompt(frame) + user_prompt
 
-        vision_message = {
-            "role": "user",
-            "content": [
-                {
-                    "type": "image",
-                    "source": {
-                        "type": "base64",
-                        "media_type": "image/jpeg",
-                        "data": img_data,
-                    },
-                },
-                {
-                    "type": "text",
-                    "text": user_prompt
+        if skip_screenshot(frame):
+            vision_message = get_unchanged_screen_message(
+                user_prompt
+                + "**REMEMBER** Only output json format, do not append any other text."
+            )
+        else:
+            vision_message = {
+                "role": "user",
+                "content": await asyncio.to_thread(
+                    get_vision_content,
+                    frame,
+                    user_prompt
                     + "**REMEMBER** Only output json format, do not append any other text.",
-                },
-            ],
-        }
+                    "anthropic",
+                    first_step=len(messages) == 1,
+                ),
+            }
         messages.append(vision_message)
 
         # anthropic api expect system prompt as an separate argument
-        response = client.messages.create(
+        response = await asyncio.to_thread(
+            client.messages.create,
             model="claude-3-opus-20240229",
             max_tokens=3000,
             system=messages[0]["content"],
@@ -1011,7 +1387,8 @@ async def call_claude_3_with_ocr(messages, objective, model):
                 print(
                     f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_RED}[Error] JSONDecodeError: {e} {ANSI_RESET}"
                 )
-            response = client.messages.create(
+            response = await asyncio.to_thread(
+                client.messages.create,
                 model="claude-3-opus-20240229",
                 max_tokens=3000,
                 system=f"This json string is not valid, when using with json.loads(content) \
@@ -1038,18 +1415,8 @@ async def call_claude_3_with_ocr(messages, objective, model):
                         "[call_claude_3_ocr][click] text_to_click",
                         text_to_click,
                     )
-                # Initialize EasyOCR Reader
-                reader = easyocr.Reader(["en"])
-
-                # Read the screenshot
-                result = reader.readtext(screenshot_filename)
-
-                # limit the text to extract has a higher success rate
-                text_element_index = get_text_element(
-                    result, text_to_click[:3], screenshot_filename
-                )
-                coordinates = get_text_coordinates(
-                    result, text_element_index, screenshot_filename
+                text_element_index, coordinates = await locate_click_target(
+                    operation, frame
                 )
 
                 # add `coordinates`` to `content`
@@ -1092,6 +1459,10 @@ async def call_claude_3_with_ocr(messages, objective, model):
         gpt4_messages = [messages[0]]  # Include the system message
         for message in messages[1:]:
             if message["role"] == "user":
+                if isinstance(message["content"], str):
+                    # text-only "no change" steps have nothing to convert
+                    gpt4_messages.append(message)
+                    continue
                 # Update the image type format from "source" to "url"
                 updated_content = []
                 for item in message["content"]:
@@ -1101,7 +1472,7 @@ async def call_claude_3_with_ocr(messages, objective, model):
                                 {
                                     "type": "image_url",
                                     "image_url": {
-                                        "url": f"data:image/png;base64,{item['source']['data']}"
+                                        "url": f"data:{item['source']['media_type']};base64,{item['source']['data']}"
                                     },
                                 }
                             )
@@ -1114,7 +1485,7 @@ async def call_claude_3_with_ocr(messages, objective, model):
                     {"role": "assistant", "content": message["content"]}
                 )
 
-        return gpt_4_fallback(gpt4_messages, objective, model)
+        return await asyncio.to_thread(gpt_4_fallback, gpt4_messages, objective, model, frame)
 
 
 def get_last_assistant_message(messages):
@@ -1131,7 +1502,11 @@ def get_last_assistant_message(messages):
     return None  # Return None if no assistant message is found
 
 
-def gpt_4_fallback(messages, objective, model):
+def gpt_4_fallback(messages, objective, model, frame=None):
+    """
+    Ask gpt-4o after `model` failed. Pass the step's `frame`: the operations
+    are mapped to the screen with it, so gpt-4o must see that same frame.
+    """
     if config.verbose:
         print("[gpt_4_fallback]")
     system_prompt = get_system_prompt("gpt-4o", objective)
@@ -1144,7 +1519,7 @@ def gpt_4_fallback(messages, objective, model):
         print("[gpt_4_fallback][updated]")
         print("[gpt_4_fallback][updated] len(messages)", len(messages))
 
-    return call_gpt_4o(messages)
+    return call_gpt_4o(messages, frame)
 
 
 def confirm_system_prompt(messages, objective, model):
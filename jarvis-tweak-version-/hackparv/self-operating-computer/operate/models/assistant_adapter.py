@@ -7,17 +7,14 @@ replacing the external Node.js server. It manages conversation history
 to allow for stateful computer control.
 """
 
-import base64
+import asyncio
 import json
-import os
-import time
 import traceback
-import io
-from PIL import Image
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from operate.config import Config
-from operate.utils.screenshot import capture_screen_with_cursor
+from operate.utils.encoding import EncodedImage, encode_frame
+from operate.utils.screenshot import capture_frame, save_debug_screenshot
 from operate.utils.style import ANSI_BRIGHT_MAGENTA, ANSI_GREEN, ANSI_RED, ANSI_RESET
 
 # Load configuration
@@ -50,33 +47,20 @@ class AssistantAdapter:
     def __init__(self):
         self.client = config.initialize_openai()
 
-    def encode_screenshot(self, screenshot_path):
+    def encode_screenshot(self, frame):
         """
-        Encode a screenshot as base64 with compression to reduce token usage.
+        Encode a captured frame with compression to reduce token usage and
+        return the `EncodedImage`, which knows its media type.
         """
-        MAX_SIZE = (1920, 1080)
-        QUALITY = 85
-        
         try:
-            with Image.open(screenshot_path) as img:
-                # resize to max dims if larger
-                img.thumbnail(MAX_SIZE, Image.Resampling.LANCZOS)
-                
-                # convert to RGB (remove alpha) for JPEG compression
-                if img.mode in ("RGBA", "P"):
-                    img = img.convert("RGB")
-                
-                buffer = io.BytesIO()
-                img.save(buffer, format="JPEG", quality=QUALITY)
-                return base64.b64encode(buffer.getvalue()).decode("utf-8")
+            return encode_frame(frame, "assistant")
         except Exception as e:
             if config.verbose:
                 print(f"[AssistantAdapter] Optimization failed, falling back to raw: {e}")
             
-            with open(screenshot_path, "rb") as img_file:
-                return base64.b64encode(img_file.read()).decode("utf-8")
+            return EncodedImage(frame.encode("PNG"), "image/png", frame.size)
 
-    def format_messages(self, messages, objective, screenshot_base64):
+    def format_messages(self, messages, objective, screenshot):
         """
         Format messages for the OpenAI API, including history and the new screenshot.
         """
@@ -104,7 +88,7 @@ class AssistantAdapter:
             {
                 "type": "image_url",
                 "image_url": {
-                    "url": f"data:image/jpeg;base64,{screenshot_base64}",
+                    "url": screenshot.data_url,
                 },
             }
         ]
@@ -168,7 +152,7 @@ class AssistantAdapter:
             raise
 
 
-async def call_assistant_with_vision(messages, objective, model):
+async def call_assistant_with_vision(messages, objective, model, frame=None):
     """
     Main function to call the Assistant API (now direct OpenAI).
     """
@@ -178,19 +162,17 @@ async def call_assistant_with_vision(messages, objective, model):
     try:
         adapter = AssistantAdapter()
 
-        screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
-        
-        screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
-        capture_screen_with_cursor(screenshot_filename)
+        if frame is None:
+            frame = await asyncio.to_thread(capture_frame)
+        await asyncio.to_thread(save_debug_screenshot, frame)
         
         # Optimize and Encode
-        screenshot_base64 = adapter.encode_screenshot(screenshot_filename)
+        screenshot = await asyncio.to_thread(adapter.encode_screenshot, frame)
         
-        api_messages = adapter.format_messages(messages, objective, screenshot_base64)
+        api_messages = adapter.format_messages(messages, objective, screenshot)
 
-        response_text = adapter.call_api(api_messages)
+        # the retries sleep between attempts, keep them off the event loop
+        response_text = await asyncio.to_thread(adapter.call_api, api_messages)
         
         if config.verbose:
             print(f"[call_assistant_with_vision] Response: {response_text}")
@@ -202,7 +184,7 @@ async def call_assistant_with_vision(messages, objective, model):
             "role": "user",
             "content": [
                 {"type": "text", "text": f"Objective: {objective}"},
-                {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{screenshot_base64}"}}
+                {"type": "image_url", "image_url": {"url": screenshot.data_url}}
             ]
         }
         messages.append(user_msg)
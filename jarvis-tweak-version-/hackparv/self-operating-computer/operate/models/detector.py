@@ -0,0 +1,253 @@
+"""
+The YOLO detector of the "gpt-4-with-som" mode.
+
+Constructing the model and its first inference (which builds the network
+and picks kernels) take far longer than a detection, so every weights file
+is loaded once per process and the same `Detector` is handed to every step
+and session through `get_detector`.
+
+Besides the PyTorch weights, exports to ONNX or OpenVINO (optionally int8
+quantized) run on CPU-only hosts without importing torch at all.
+
+This module does not import the configuration, it is also loaded by the
+worker processes of `operate.utils.workers`.
+"""
+
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+
+import numpy as np
+from PIL import Image
+
+# Trained UI element detector shipped in `operate/models/weights`
+DEFAULT_WEIGHTS = "best.pt"
+
+_detectors = {}
+_detectors_lock = threading.Lock()
+
+
+def get_weights_path(name=DEFAULT_WEIGHTS):
+    """Path of a weights file shipped in `operate.models.weights`."""
+    import pkg_resources
+
+    return pkg_resources.resource_filename("operate.models.weights", name)
+
+
+class Detector:
+    """
+    A YOLO model loaded on first use (or by `warm_up`) and kept resident.
+
+    This one runs the PyTorch weights through Ultralytics. `threads` pins the
+    number of torch CPU threads when the model is loaded; torch applies it to
+    the whole process. Detections are serialized, the model is not meant to
+    run from several threads at once.
+    """
+
+    # Ultralytics' default thresholds, the exported runtimes use the same
+    confidence = 0.25
+    iou_threshold = 0.7
+    max_detections = 300
+
+    def __init__(self, weights, threads=None):
+        self.weights = weights
+        self.threads = threads
+        self.load_time = None
+        self._model = None
+        self._lock = threading.Lock()
+        self._warm_up_thread = None
+
+    def _load(self):
+        if self._model is None:
+            started = time.time()
+            self._model = self._create()
+            # the first inference builds the network, pay for it now
+            self._predict(np.zeros((64, 64, 3), dtype=np.uint8))
+            self.load_time = time.time() - started
+        return self._model
+
+    def _create(self):
+        from ultralytics import YOLO
+
+        if self.threads:
+            import torch
+
+            torch.set_num_threads(self.threads)
+        return YOLO(self.weights)
+
+    def _predict(self, pixels):
+        # YOLO reads arrays in OpenCV's BGR channel order
+        results = self._model(
+            pixels[:, :, ::-1],
+            conf=self.confidence,
+            iou=self.iou_threshold,
+            max_det=self.max_detections,
+            verbose=False,
+        )
+        boxes = []
+        for result in results:
+            if hasattr(result, "boxes"):
+                boxes.extend(result.boxes.xyxy.tolist())
+        return boxes
+
+    def load(self):
+        with self._lock:
+            self._load()
+        return self
+
+    def detect(self, pixels):
+        """
+        Detect UI elements on an RGB array and return their boxes as
+        ``[x1, y1, x2, y2]`` lists, most confident first.
+        """
+        with self._lock:
+            self._load()
+            return self._predict(pixels)
+
+    def warm_up(self, background=True):
+        """Load the model, on a daemon thread unless `background` is False."""
+        if not background:
+            return self.load()
+        if self._warm_up_thread is None:
+            self._warm_up_thread = threading.Thread(
+                target=self._warm_up, name="detector-warm-up", daemon=True
+            )
+            self._warm_up_thread.start()
+        return self._warm_up_thread
+
+    def _warm_up(self):
+        try:
+            self.load()
+        except Exception:
+            # `detect` raises the error again when the mode needs the model
+            pass
+
+
+def letterbox(pixels, size):
+    """
+    Fit an RGB array into a `size` square the way Ultralytics does: resized
+    keeping its aspect ratio and centered on gray padding. Returns the
+    ``(1, 3, size, size)`` float input and the ``(ratio, left, top)`` of the
+    resized image, which map boxes back.
+    """
+    height, width = pixels.shape[:2]
+    ratio = min(size / height, size / width)
+    new_width, new_height = round(width * ratio), round(height * ratio)
+    image = Image.fromarray(np.ascontiguousarray(pixels))
+    if (new_width, new_height) != (width, height):
+        image = image.resize((new_width, new_height), Image.Resampling.BILINEAR)
+    pad_x, pad_y = (size - new_width) / 2, (size - new_height) / 2
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    top, left = int(round(pad_y - 0.1)), int(round(pad_x - 0.1))
+    canvas[top : top + new_height, left : left + new_width] = np.asarray(image)
+    batch = canvas.transpose(2, 0, 1)[None].astype(np.float32) / 255.0
+    return batch, (ratio, left, top)
+
+
+def non_max_suppression(boxes, scores, iou_threshold, max_detections):
+    """Indices of the boxes kept by greedy NMS, most confident first."""
+    order = np.argsort(-scores)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    keep = []
+    while order.size and len(keep) < max_detections:
+        best, rest = order[0], order[1:]
+        keep.append(best)
+        width = np.minimum(boxes[best, 2], boxes[rest, 2]) - np.maximum(boxes[best, 0], boxes[rest, 0])
+        height = np.minimum(boxes[best, 3], boxes[rest, 3]) - np.maximum(boxes[best, 1], boxes[rest, 1])
+        intersection = np.clip(width, 0, None) * np.clip(height, 0, None)
+        iou = intersection / np.maximum(areas[best] + areas[rest] - intersection, 1e-9)
+        order = rest[iou <= iou_threshold]
+    return keep
+
+
+class ExportedDetector(Detector, ABC):
+    """
+    A detector exported from `best.pt` (see `operate.models.export_detector`)
+    and run without PyTorch. Exports have a fixed square input size, the
+    screen is letterboxed into it and the raw YOLOv8 output, one
+    ``(cx, cy, w, h, class scores...)`` column per anchor, is decoded here.
+    """
+
+    input_size = 640
+
+    def _predict(self, pixels):
+        height, width = pixels.shape[:2]
+        batch, (ratio, pad_x, pad_y) = letterbox(pixels, self.input_size)
+        predictions = self._infer(batch)[0].T
+        scores = predictions[:, 4:].max(axis=1)
+        predictions, scores = predictions[scores > self.confidence], scores[scores > self.confidence]
+        if not len(predictions):
+            return []
+
+        center, half = predictions[:, :2], predictions[:, 2:4] / 2
+        boxes = np.concatenate([center - half, center + half], axis=1)
+        boxes = (boxes - [pad_x, pad_y, pad_x, pad_y]) / ratio
+        boxes = np.clip(boxes, 0, [width, height, width, height])
+        keep = non_max_suppression(boxes, scores, self.iou_threshold, self.max_detections)
+        return boxes[keep].tolist()
+
+    @abstractmethod
+    def _infer(self, batch):
+        """Raw model output for a letterboxed ``(1, 3, size, size)`` batch."""
+
+
+class ONNXDetector(ExportedDetector):
+    """An ONNX export run by ONNX Runtime on the CPU."""
+
+    def _create(self):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        if self.threads:
+            options.intra_op_num_threads = self.threads
+        session = onnxruntime.InferenceSession(
+            self.weights, options, providers=["CPUExecutionProvider"]
+        )
+        model_input = session.get_inputs()[0]
+        self._input_name = model_input.name
+        if isinstance(model_input.shape[-1], int):
+            self.input_size = model_input.shape[-1]
+        return session
+
+    def _infer(self, batch):
+        return self._model.run(None, {self._input_name: batch})[0]
+
+
+class OpenVINODetector(ExportedDetector):
+    """An OpenVINO export (the ``.xml`` file or its directory) on the CPU."""
+
+    def _create(self):
+        import openvino
+
+        path = self.weights
+        if os.path.isdir(path):
+            path = next(
+                os.path.join(path, name) for name in os.listdir(path) if name.endswith(".xml")
+            )
+        config = {"INFERENCE_NUM_THREADS": self.threads} if self.threads else {}
+        model = openvino.Core().compile_model(path, "CPU", config)
+        self.input_size = model.inputs[0].get_shape()[-1]
+        return model
+
+    def _infer(self, batch):
+        return self._model(batch)[0]
+
+
+def detector_class(weights):
+    """The `Detector` subclass running `weights`, chosen by its file type."""
+    if weights.endswith(".onnx"):
+        return ONNXDetector
+    if weights.endswith(".xml") or os.path.isdir(weights):
+        return OpenVINODetector
+    return Detector
+
+
+def get_detector(weights=None, threads=None):
+    """Return the resident `Detector` of `weights`, the shipped model by default."""
+    weights = weights or get_weights_path()
+    with _detectors_lock:
+        detector = _detectors.get(weights)
+        if detector is None:
+            detector = _detectors[weights] = detector_class(weights)(weights, threads)
+        return detector
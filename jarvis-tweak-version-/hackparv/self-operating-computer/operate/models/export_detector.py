@@ -0,0 +1,77 @@
+"""
+Export the SoM detector for CPU-only hosts.
+
+Writes an ONNX or OpenVINO version of `best.pt` with a fixed input size,
+optionally quantized to int8, to use with ``OPERATE_DETECTOR_WEIGHTS``.
+Exporting needs Ultralytics and PyTorch, running the export only needs
+`requirements-detector.txt`. Check the result with `benchmarks/detector.py`.
+
+ONNX int8 uses dynamic quantization (int8 weights, activations quantized at
+run time), which needs no calibration data. OpenVINO int8 calibrates on the
+Ultralytics dataset YAML given with ``--data``.
+
+Usage:
+    python -m operate.models.export_detector --format onnx --int8
+    python -m operate.models.export_detector --format openvino --int8 --data screens.yaml
+"""
+
+import argparse
+import os
+import shutil
+
+from operate.models.detector import get_weights_path
+
+
+def export_detector(weights, export_format="onnx", input_size=640, int8=False, data=None, output=None):
+    """Export `weights` and return the path to pass as ``OPERATE_DETECTOR_WEIGHTS``."""
+    from ultralytics import YOLO
+
+    model = YOLO(weights)
+    options = {"format": export_format, "imgsz": input_size, "dynamic": False}
+    if export_format == "onnx":
+        options["simplify"] = True
+    elif int8:
+        options["int8"] = True
+        if data:
+            options["data"] = data
+    path = model.export(**options)
+
+    if export_format == "onnx" and int8:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantized = path[: -len(".onnx")] + "_int8.onnx"
+        quantize_dynamic(path, quantized, weight_type=QuantType.QUInt8)
+        path = quantized
+
+    if output:
+        if os.path.isdir(path):
+            shutil.copytree(path, output, dirs_exist_ok=True)
+        else:
+            shutil.copyfile(path, output)
+        path = output
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--weights", default=None, help="PyTorch weights, the shipped best.pt by default")
+    parser.add_argument("--format", choices=("onnx", "openvino"), default="onnx")
+    parser.add_argument("--input-size", type=int, default=640, help="Fixed square input size")
+    parser.add_argument("--int8", action="store_true", help="Quantize to int8")
+    parser.add_argument("--data", default=None, help="OpenVINO int8: calibration dataset YAML")
+    parser.add_argument("--output", default=None, help="Where to copy the export")
+    args = parser.parse_args()
+
+    path = export_detector(
+        args.weights or get_weights_path(),
+        args.format,
+        args.input_size,
+        args.int8,
+        args.data,
+        args.output,
+    )
+    print(f"Exported to {path}, use it with OPERATE_DETECTOR_WEIGHTS={path}")
+
+
+if __name__ == "__main__":
+    main()
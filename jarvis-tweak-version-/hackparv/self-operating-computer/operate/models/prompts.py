@@ -207,6 +207,38 @@ Please take the next best action. The `pyautogui` library will be used to execut
 Action:"""
 
 
+OPERATE_UNCHANGED_SCREEN_PROMPT = """
+The screen has not visibly changed yet since your last actions, so no new screenshot is attached. The previous screenshot is still accurate. If your last actions were supposed to change the screen, the application may still be loading; only try something else if you have reason to think they missed their target.
+"""
+
+
+OPERATE_CHANGED_TILES_PROMPT = """
+Only parts of the screen changed since the previous screenshot. The first image is a low resolution view of the whole screen, the next images are the changed regions at full resolution. Everything else still looks exactly like the previous screenshot.
+{regions}
+Keep giving "x" and "y" as percentages of the whole screen.
+"""
+
+OPERATE_FOCUS_PROMPT = """
+The first image is a low resolution view of the whole screen. The second image shows x from {x1:.3f} to {x2:.3f} and y from {y1:.3f} to {y2:.3f} of the screen at full resolution, to read small text there.
+Keep giving "x" and "y" as percentages of the whole screen. If you need to see another area in detail before acting, answer only with
+[{{ "thought": "write a thought here", "operation": "zoom", "x": "x percent (e.g. 0.10)", "y": "y percent (e.g. 0.13)" }}]
+and the next screenshot will be centered there.
+"""
+
+OPERATE_LABEL_TABLE_PROMPT = """
+The screenshot is downscaled, the labels may be hard to read in it. These are the labelled elements, one per line: the label, its box as x1,y1,x2,y2 in fractions of the screen, and the text read inside it if any.
+{table}
+Click elements by these labels.
+"""
+
+OPERATE_GROUNDING_PROMPT = """
+These elements were detected on the screen, one per line: a label and its box as x1,y1,x2,y2 in fractions of the screen.
+{table}
+To click an element without readable text, such as an icon, give its label instead of "text":
+[{{ "thought": "write a thought here", "operation": "click", "label": "~x" }}]
+"""
+
+
 def get_system_prompt(model, objective):
     """
     Format the vision prompt more efficiently and print the name of the prompt used
@@ -265,3 +297,53 @@ def get_user_prompt():
 def get_user_first_message_prompt():
     prompt = OPERATE_FIRST_MESSAGE_PROMPT
     return prompt
+
+
+def get_user_unchanged_screen_prompt():
+    prompt = OPERATE_UNCHANGED_SCREEN_PROMPT
+    return prompt
+
+
+def get_user_focus_prompt(region):
+    """Describe the high resolution crop, `region` being a box in fractions of the screen."""
+    x1, y1, x2, y2 = region
+    prompt = OPERATE_FOCUS_PROMPT.format(x1=x1, y1=y1, x2=x2, y2=y2)
+    return prompt
+
+
+def get_user_label_table_prompt(rows):
+    """
+    List the labelled elements, `rows` being ``(label, box, text)`` with the
+    box in fractions of the screen, as returned by `label_table`.
+    """
+    prompt = OPERATE_LABEL_TABLE_PROMPT.format(table=format_label_rows(rows))
+    return prompt
+
+
+def get_user_grounding_prompt(rows):
+    """List the detected elements a click may name by label, see `get_user_label_table_prompt`."""
+    prompt = OPERATE_GROUNDING_PROMPT.format(table=format_label_rows(rows))
+    return prompt
+
+
+def format_label_rows(rows):
+    lines = []
+    for label, (x1, y1, x2, y2), text in rows:
+        line = f"{label} {x1:.3f},{y1:.3f},{x2:.3f},{y2:.3f}"
+        if text:
+            line += f' "{text}"'
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def get_user_changed_tiles_prompt(regions):
+    """
+    Describe where each attached crop sits, `regions` being ``(x1, y1, x2, y2)``
+    boxes in fractions of the screen.
+    """
+    lines = [
+        f"Region {index + 1}: x from {x1:.3f} to {x2:.3f}, y from {y1:.3f} to {y2:.3f}"
+        for index, (x1, y1, x2, y2) in enumerate(regions)
+    ]
+    prompt = OPERATE_CHANGED_TILES_PROMPT.format(regions="\n".join(lines))
+    return prompt
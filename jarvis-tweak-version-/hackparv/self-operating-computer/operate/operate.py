@@ -1,6 +1,5 @@
 import sys
 import os
-import time
 import asyncio
 from prompt_toolkit.shortcuts import message_dialog
 from prompt_toolkit import prompt
@@ -23,14 +22,38 @@ from operate.utils.style import (
     style,
 )
 from operate.utils.operating_system import OperatingSystem
-from operate.models.apis import get_next_action
+from operate.models.apis import (
+    get_detector_weights,
+    get_next_action,
+    start_vision_workers,
+    uses_detector,
+    uses_ocr,
+)
+from operate.models.detector import get_detector
+from operate.utils.ocr import get_ocr_service
+from operate.utils.grabber import start_frame_grabber
+from operate.utils.screenshot import get_damage_monitor, wait_for_settle
 
 # Load configuration
 config = Config()
 operating_system = OperatingSystem()
 
 
-def main(model, terminal_prompt, voice_mode=False, verbose_mode=False):
+def main(
+    model,
+    terminal_prompt,
+    voice_mode=False,
+    verbose_mode=False,
+    save_screenshots=False,
+    capture_backend=None,
+    capture_region=None,
+    vision_mode=None,
+    speculative_ocr=False,
+    ocr_engine=None,
+    som_mode=None,
+    frame_grabber=False,
+    grab_fps=None,
+):
     """
     Main function for the Self-Operating Computer.
 
@@ -38,6 +61,16 @@ def main(model, terminal_prompt, voice_mode=False, verbose_mode=False):
     - model: The model used for generating responses.
     - terminal_prompt: A string representing the prompt provided in the terminal.
     - voice_mode: A boolean indicating whether to enable voice mode.
+    - verbose_mode: A boolean indicating whether to enable verbose mode.
+    - save_screenshots: A boolean indicating whether to keep screenshots on disk.
+    - capture_backend: Optional Linux screen capture backend (auto, pil or xshm).
+    - capture_region: Optional part of the screen to capture (screen, window or x,y,width,height).
+    - vision_mode: Optional way of sending the screen to the model (full, tiles or focus).
+    - speculative_ocr: A boolean indicating whether to run OCR concurrently with the model request.
+    - ocr_engine: Optional OCR engine (easyocr, tesseract or onnx).
+    - som_mode: Optional way of sending the gpt-4-with-som labels (pixels or table).
+    - frame_grabber: A boolean indicating whether to sample the screen in the background.
+    - grab_fps: Optional sampling rate for the background frame grabber.
 
     Returns:
     None
@@ -47,6 +80,23 @@ def main(model, terminal_prompt, voice_mode=False, verbose_mode=False):
     # Initialize `WhisperMic`, if `voice_mode` is True
 
     config.verbose = verbose_mode
+    config.save_screenshots = save_screenshots
+    if capture_backend:
+        config.capture_backend = capture_backend
+    if capture_region:
+        config.capture_region = capture_region
+    if vision_mode:
+        config.vision_mode = vision_mode
+    if speculative_ocr:
+        config.ocr_speculative = True
+    if ocr_engine:
+        config.ocr_engine = ocr_engine
+    if som_mode:
+        config.som_mode = som_mode
+    if frame_grabber:
+        config.frame_grabber = True
+    if grab_fps:
+        config.frame_grabber_fps = grab_fps
     config.validation(model, voice_mode)
 
     if voice_mode:
@@ -96,6 +146,18 @@ def main(model, terminal_prompt, voice_mode=False, verbose_mode=False):
         print(f"{ANSI_YELLOW}[User]{ANSI_RESET}")
         objective = prompt(style=style)
 
+    if config.frame_grabber:
+        start_frame_grabber()
+    # Start listening for screen changes before the first action
+    get_damage_monitor()
+    # Worker processes load their models while the objective is typed
+    start_vision_workers(model)
+    if uses_ocr(model) and config.ocr_warm_up:
+        get_ocr_service().warm_up()
+    if uses_detector(model) and not config.vision_workers:
+        # the workers load it themselves, otherwise load it here while waiting
+        get_detector(get_detector_weights(), config.yolo_threads).warm_up()
+
     system_prompt = get_system_prompt(model, objective)
     system_message = {"role": "system", "content": system_prompt}
     messages = [system_message]
@@ -134,11 +196,13 @@ def main(model, terminal_prompt, voice_mode=False, verbose_mode=False):
 def operate(operations, model):
     if config.verbose:
         print("[Self Operating Computer][operate]")
-    for operation in operations:
+    for index, operation in enumerate(operations):
         if config.verbose:
             print("[Self Operating Computer][operate] operation", operation)
-        # wait one second
-        time.sleep(1)
+        # wait for the previous operation's effect to settle on screen; the
+        # first one runs against the screen the model just looked at
+        if index > 0:
+            wait_for_settle()
         operate_type = operation.get("operation").lower()
         operate_thought = operation.get("thought")
         operate_detail = ""
@@ -160,6 +224,9 @@ def operate(operations, model):
             operate_detail = click_detail
 
             operating_system.mouse(click_detail)
+        elif operate_type == "zoom":
+            # Only moves the focus of the next screenshot, see `get_focus_point`
+            operate_detail = {"x": operation.get("x"), "y": operation.get("y")}
         elif operate_type == "done":
             summary = operation.get("summary")
 
@@ -0,0 +1,255 @@
+"""
+Screen change detection.
+
+Cheap, vectorized comparisons between captured frames. The agent loop uses
+them to tell when the UI has settled after an action instead of sleeping for
+a fixed amount of time, and whether a step changed the screen at all.
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+import numpy as np
+
+# Fraction of the screen that may change while it still counts as settled,
+# so a blinking text cursor does not keep it "busy"
+SETTLE_TOLERANCE = 0.001
+
+
+def downsample(pixels, step=8):
+    """
+    Return a small grayscale version of `pixels` for comparisons.
+
+    Takes every `step`-th pixel in both directions, which is a strided view and
+    costs nothing, then averages the color channels.
+    """
+    return pixels[::step, ::step].mean(axis=2, dtype=np.float32)
+
+
+def changed_fraction(previous, current, threshold=12):
+    """
+    Fraction of pixels whose brightness moved by more than `threshold`
+    between two downsampled frames of the same shape.
+    """
+    if previous.shape != current.shape:
+        return 1.0
+    return float(np.count_nonzero(np.abs(current - previous) > threshold)) / current.size
+
+
+def wait_until_stable(
+    next_frame,
+    stable_ms=300,
+    timeout=2.0,
+    step=8,
+    threshold=12,
+    tolerance=SETTLE_TOLERANCE,
+):
+    """
+    Sample frames until the screen has not changed for `stable_ms`.
+
+    Args:
+        next_frame (callable): Returns the next `Frame` to look at, or None when
+            no more frames are available.
+        stable_ms (int): How long the screen must stay unchanged.
+        timeout (float): Give up after this many seconds and return the newest frame.
+        step (int): Downsampling step used for the comparison.
+        threshold (int): Per-pixel brightness change that counts as a change.
+        tolerance (float): Fraction of changed pixels still considered stable.
+
+    Returns:
+        Frame: The newest frame sampled, or None if `next_frame` produced none.
+    """
+    deadline = time.time() + timeout
+    frame = next_frame()
+    if frame is None:
+        return None
+
+    # Compare against the first frame of the current stable window rather than
+    # the previous sample, so slow fades cannot creep under the threshold
+    reference = downsample(frame.pixels, step)
+    stable_since = frame.timestamp
+
+    while (frame.timestamp - stable_since) * 1000 < stable_ms:
+        if time.time() >= deadline:
+            break
+        candidate = next_frame()
+        if candidate is None:
+            break
+        small = downsample(candidate.pixels, step)
+        if changed_fraction(reference, small, threshold) > tolerance:
+            reference = small
+            stable_since = candidate.timestamp
+        frame = candidate
+
+    return frame
+
+
+def perceptual_hash(pixels, hash_size=16):
+    """
+    Difference hash ("dHash") of a frame as a flat boolean array.
+
+    The frame is reduced to a ``hash_size x (hash_size + 1)`` grid of block
+    averages, and each bit records whether a cell is brighter than its right
+    neighbour. Global shifts in brightness or tiny local changes barely move
+    the hash, while layout changes flip many bits.
+    """
+    gray = downsample(pixels, step=4)
+    rows = np.linspace(0, gray.shape[0], hash_size + 1).astype(int)[:-1]
+    cols = np.linspace(0, gray.shape[1], hash_size + 2).astype(int)[:-1]
+    sums = np.add.reduceat(np.add.reduceat(gray, rows, axis=0), cols, axis=1)
+    counts = np.outer(
+        np.diff(np.append(rows, gray.shape[0])),
+        np.diff(np.append(cols, gray.shape[1])),
+    )
+    blocks = sums / counts
+    return (blocks[:, 1:] > blocks[:, :-1]).ravel()
+
+
+def frame_hash(frame):
+    """Perceptual hash of `frame`, computed once and cached on the frame."""
+    if "phash" not in frame.cache:
+        frame.cache["phash"] = perceptual_hash(frame.pixels)
+    return frame.cache["phash"]
+
+
+def hash_distance(hash_a, hash_b):
+    """Number of differing bits between two perceptual hashes."""
+    return int(np.count_nonzero(hash_a != hash_b))
+
+
+def dirty_tile_counts(previous, current, tile_size=64):
+    """
+    Count the changed pixels of every `tile_size` square tile.
+
+    Compares two full resolution RGB arrays of the same shape exactly, since
+    raw captures carry no compression noise, and returns an integer grid of
+    shape ``(rows, cols)``.
+    """
+    changed = np.any(previous != current, axis=2).view(np.uint8)
+    rows = np.arange(0, changed.shape[0], tile_size)
+    cols = np.arange(0, changed.shape[1], tile_size)
+    return np.add.reduceat(
+        np.add.reduceat(changed, rows, axis=0, dtype=np.int32), cols, axis=1
+    )
+
+
+def tile_boxes(mask, tile_size, size):
+    """
+    Turn a boolean tile grid into ``(x1, y1, x2, y2)`` pixel boxes, clipped to
+    the frame `size` given as ``(width, height)``.
+    """
+    width, height = size
+    boxes = []
+    for row, col in zip(*np.nonzero(mask)):
+        x1, y1 = int(col) * tile_size, int(row) * tile_size
+        x2, y2 = min(x1 + tile_size, width), min(y1 + tile_size, height)
+        boxes.append((x1, y1, x2, y2))
+    return boxes
+
+
+def merge_tiles(mask, tile_size, size):
+    """
+    Group the set tiles of a boolean grid into connected regions (sharing an
+    edge or a corner) and return the bounding box of each region as
+    ``(x1, y1, x2, y2)`` pixels, clipped to `size` given as ``(width, height)``.
+    """
+    width, height = size
+    rows, cols = mask.shape
+    seen = np.zeros_like(mask, dtype=bool)
+    boxes = []
+    for row, col in zip(*np.nonzero(mask)):
+        if seen[row, col]:
+            continue
+        seen[row, col] = True
+        stack = [(row, col)]
+        top, left, bottom, right = row, col, row, col
+        while stack:
+            r, c = stack.pop()
+            top, left = min(top, r), min(left, c)
+            bottom, right = max(bottom, r), max(right, c)
+            for dr in (-1, 0, 1):
+                for dc in (-1, 0, 1):
+                    nr, nc = r + dr, c + dc
+                    if 0 <= nr < rows and 0 <= nc < cols and mask[nr, nc] and not seen[nr, nc]:
+                        seen[nr, nc] = True
+                        stack.append((nr, nc))
+        boxes.append(
+            (
+                int(left) * tile_size,
+                int(top) * tile_size,
+                min((int(right) + 1) * tile_size, width),
+                min((int(bottom) + 1) * tile_size, height),
+            )
+        )
+    return boxes
+
+
+@dataclass
+class FrameChange:
+    """How a frame differs from an earlier one."""
+
+    hash_distance: int
+    changed_pixels: int
+    regions: List[Tuple[int, int, int, int]] = field(default_factory=list)
+    changed: bool = True
+
+
+def compare_frames(
+    previous,
+    current,
+    tile_size=64,
+    max_hash_distance=0,
+    max_changed_pixels=32,
+    damage=None,
+):
+    """
+    Compare two frames with a perceptual hash and a per-tile dirty check.
+
+    The hash catches layout changes cheaply, the tile counts catch small local
+    changes it is blind to, such as a toggled checkbox, and also give the dirty
+    regions. A handful of changed pixels (a blinking text cursor) is tolerated.
+
+    `damage` is the list of rectangles the X server reported as redrawn between
+    the two frames, if known. An empty list means nothing was redrawn and the
+    pixels are not compared at all.
+    """
+    if damage is not None and not damage and previous.size == current.size:
+        return FrameChange(hash_distance=0, changed_pixels=0, changed=False)
+
+    if previous.size != current.size:
+        width, height = current.size
+        return FrameChange(
+            hash_distance=-1,
+            changed_pixels=width * height,
+            regions=[(0, 0, width, height)],
+        )
+
+    distance = hash_distance(frame_hash(previous), frame_hash(current))
+    counts = dirty_tile_counts(previous.pixels, current.pixels, tile_size)
+    changed_pixels = int(counts.sum())
+    return FrameChange(
+        hash_distance=distance,
+        changed_pixels=changed_pixels,
+        regions=tile_boxes(counts > 0, tile_size, current.size),
+        changed=distance > max_hash_distance or changed_pixels > max_changed_pixels,
+    )
+
+
+class ChangeTracker:
+    """Remembers the frame of the previous agent step to compare the next one against."""
+
+    def __init__(self):
+        self.previous = None
+
+    def compare(self, frame, **kwargs):
+        """Return a `FrameChange` against the previous step, or None on the first step."""
+        if self.previous is None:
+            return None
+        return compare_frames(self.previous, frame, **kwargs)
+
+    def remember(self, frame):
+        self.previous = frame
+
+    def reset(self):
+        self.previous = None
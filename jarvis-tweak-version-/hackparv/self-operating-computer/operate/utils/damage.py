@@ -0,0 +1,226 @@
+"""
+Screen change notifications through the X DAMAGE extension.
+
+Instead of capturing and diffing frames to find out whether something moved,
+the X server tells us which rectangles of the root window were redrawn. A
+daemon thread listens for these events on its own display connection and
+keeps a short history of them, which settle detection and change detection
+read without touching the framebuffer.
+"""
+
+import collections
+import ctypes
+import select
+import threading
+import time
+
+from operate.exceptions import CaptureBackendError
+from operate.utils.change import SETTLE_TOLERANCE
+from operate.utils.x11 import _load_library, load_libraries, open_display
+
+XDamageReportRawRectangles = 0
+XDamageNotify = 0
+
+
+class XRectangle(ctypes.Structure):
+    _fields_ = [
+        ("x", ctypes.c_short),
+        ("y", ctypes.c_short),
+        ("width", ctypes.c_ushort),
+        ("height", ctypes.c_ushort),
+    ]
+
+
+class XDamageNotifyEvent(ctypes.Structure):
+    _fields_ = [
+        ("type", ctypes.c_int),
+        ("serial", ctypes.c_ulong),
+        ("send_event", ctypes.c_int),
+        ("display", ctypes.c_void_p),
+        ("drawable", ctypes.c_ulong),
+        ("damage", ctypes.c_ulong),
+        ("level", ctypes.c_int),
+        ("more", ctypes.c_int),
+        ("timestamp", ctypes.c_ulong),
+        ("area", XRectangle),
+        ("geometry", XRectangle),
+    ]
+
+
+class XEvent(ctypes.Union):
+    # Xlib pads every event to 24 longs
+    _fields_ = [
+        ("type", ctypes.c_int),
+        ("damage", XDamageNotifyEvent),
+        ("pad", ctypes.c_long * 24),
+    ]
+
+
+_xdamage = None
+
+
+def load_xdamage():
+    """Load and prototype libXdamage once per process, next to libX11."""
+    global _xdamage
+    if _xdamage is not None:
+        return _xdamage
+
+    xlib, _, _ = load_libraries()
+    xdamage = _load_library("Xdamage")
+
+    xdamage.XDamageQueryExtension.argtypes = [
+        ctypes.c_void_p,
+        ctypes.POINTER(ctypes.c_int),
+        ctypes.POINTER(ctypes.c_int),
+    ]
+    xdamage.XDamageQueryExtension.restype = ctypes.c_int
+    xdamage.XDamageCreate.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int]
+    xdamage.XDamageCreate.restype = ctypes.c_ulong
+    xdamage.XDamageDestroy.argtypes = [ctypes.c_void_p, ctypes.c_ulong]
+
+    xlib.XConnectionNumber.argtypes = [ctypes.c_void_p]
+    xlib.XConnectionNumber.restype = ctypes.c_int
+    xlib.XPending.argtypes = [ctypes.c_void_p]
+    xlib.XPending.restype = ctypes.c_int
+    xlib.XNextEvent.argtypes = [ctypes.c_void_p, ctypes.POINTER(XEvent)]
+    xlib.XFlush.argtypes = [ctypes.c_void_p]
+
+    _xdamage = xdamage
+    return _xdamage
+
+
+class DamageMonitor(threading.Thread):
+    """
+    Collects the rectangles the X server reports as redrawn.
+
+    Every damage event is stored as ``(received_at, (x1, y1, x2, y2))`` in a
+    bounded history. When more events arrive than the history holds, queries
+    reaching back past the oldest entry return None ("unknown") so callers
+    fall back to comparing pixels.
+    """
+
+    def __init__(self, display_name=None, history=4096):
+        super().__init__(name="damage-monitor", daemon=True)
+        self._xlib, _, _ = load_libraries()
+        self._xdamage = load_xdamage()
+        self._display = open_display(display_name)
+        self._damage = None
+        try:
+            event_base, error_base = ctypes.c_int(), ctypes.c_int()
+            if not self._xdamage.XDamageQueryExtension(
+                self._display, ctypes.byref(event_base), ctypes.byref(error_base)
+            ):
+                raise CaptureBackendError("The X server does not support DAMAGE")
+            self._event_type = event_base.value + XDamageNotify
+            screen = self._xlib.XDefaultScreen(self._display)
+            self.screen_area = self._xlib.XDisplayWidth(
+                self._display, screen
+            ) * self._xlib.XDisplayHeight(self._display, screen)
+            root = self._xlib.XDefaultRootWindow(self._display)
+            self._damage = self._xdamage.XDamageCreate(
+                self._display, root, XDamageReportRawRectangles
+            )
+            self._xlib.XFlush(self._display)
+        except Exception:
+            self._close_display()
+            raise
+
+        self._events = collections.deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.started_at = time.time()
+        # Time of the oldest damage event still in the history
+        self._complete_since = self.started_at
+
+    def run(self):
+        fd = self._xlib.XConnectionNumber(self._display)
+        event = XEvent()
+        try:
+            while not self._stop_event.is_set():
+                if not self._xlib.XPending(self._display):
+                    # Wake up regularly to notice `stop()`
+                    select.select([fd], [], [], 0.1)
+                    continue
+                while self._xlib.XPending(self._display):
+                    self._xlib.XNextEvent(self._display, ctypes.byref(event))
+                    if event.type == self._event_type:
+                        self._record(event.damage.area)
+        finally:
+            self._close_display()
+
+    def _record(self, area):
+        box = (area.x, area.y, area.x + area.width, area.y + area.height)
+        now = time.time()
+        with self._lock:
+            if len(self._events) == self._events.maxlen:
+                self._complete_since = self._events[0][0]
+            self._events.append((now, box))
+
+    def events_since(self, timestamp):
+        """
+        Damage events received after `timestamp` as ``(received_at, box)``
+        pairs, oldest first. Returns None when the history does not reach
+        back that far.
+        """
+        with self._lock:
+            if timestamp < self._complete_since:
+                return None
+            return [event for event in self._events if event[0] > timestamp]
+
+    def regions_since(self, timestamp):
+        """
+        Rectangles redrawn after `timestamp` as ``(x1, y1, x2, y2)`` boxes.
+
+        Returns None when the history does not reach back that far.
+        """
+        events = self.events_since(timestamp)
+        return None if events is None else [box for received, box in events]
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _close_display(self):
+        if self._display is None:
+            return
+        if self._damage:
+            self._xdamage.XDamageDestroy(self._display, self._damage)
+            self._damage = None
+        self._xlib.XCloseDisplay(self._display)
+        self._display = None
+
+
+def busy_until(events, min_area):
+    """
+    Time of the newest of `events` such that everything redrawn after it
+    covers at most `min_area` pixels, or 0 when all of them together do.
+    """
+    area = 0
+    for received, (x1, y1, x2, y2) in reversed(events):
+        area += (x2 - x1) * (y2 - y1)
+        if area > min_area:
+            return received
+    return 0.0
+
+
+def wait_for_quiet(
+    monitor, started, stable_ms=300, timeout=2.0, tolerance=SETTLE_TOLERANCE
+):
+    """
+    Block until the damage `monitor` saw during the last `stable_ms` covers
+    at most `tolerance` of the screen, counting from `started` at the
+    earliest, or until `timeout` seconds passed. As with the frame polling
+    of `operate.utils.change.wait_until_stable`, a blinking caret or a small
+    animation does not keep the screen busy.
+    """
+    deadline = started + timeout
+    stable = stable_ms / 1000.0
+    min_area = tolerance * monitor.screen_area
+    while True:
+        now = time.time()
+        events = monitor.events_since(max(now - stable, monitor.started_at))
+        # an overflowing history means a lot is being redrawn right now
+        busy = now if events is None else busy_until(events, min_area)
+        quiet_from = max(busy, started)
+        if now - quiet_from >= stable or now >= deadline:
+            return
+        time.sleep(min(quiet_from + stable, deadline) - now)
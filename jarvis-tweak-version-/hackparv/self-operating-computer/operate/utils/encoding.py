@@ -0,0 +1,173 @@
+"""
+Image encoding for the model providers.
+
+Every provider gets its screenshot through `encode_frame`, configured by an
+`EncodingProfile` describing its size budget, format and quality. The result
+is cached on the frame, so providers sharing a profile (or retrying a call)
+encode each capture only once.
+"""
+
+import base64
+import io
+import math
+from dataclasses import dataclass, replace
+from typing import Optional, Tuple
+
+from PIL import Image
+
+from operate.config import Config
+
+# Load configuration
+config = Config()
+
+
+@dataclass(frozen=True)
+class EncodingProfile:
+    """
+    How to turn a frame into the image a provider receives.
+
+    Attributes:
+        format (str): "JPEG" or "PNG".
+        quality (int): JPEG quality.
+        max_size (tuple): Optional ``(width, height)`` box the image must fit in.
+        max_pixels (int): Optional upper bound on ``width * height``.
+        max_short_side (int): Optional upper bound on the shorter side.
+        grayscale (bool): Drop the colors.
+        colors (int): Quantize to a palette of this many colors, which
+            implies PNG since JPEG has no palette mode.
+    """
+
+    format: str = "JPEG"
+    quality: int = 85
+    max_size: Optional[Tuple[int, int]] = None
+    max_pixels: Optional[int] = None
+    max_short_side: Optional[int] = None
+    grayscale: bool = False
+    colors: Optional[int] = None
+
+    @property
+    def media_type(self):
+        return "image/png" if self.output_format == "PNG" else "image/jpeg"
+
+    @property
+    def output_format(self):
+        return "PNG" if self.colors else self.format.upper()
+
+
+# Sizes match what each API downsizes to on its own, so we never upload pixels
+# that are thrown away on arrival
+PROVIDER_PROFILES = {
+    # high detail images are fit in 2048x2048, then the short side to 768
+    "openai": EncodingProfile(max_size=(2048, 2048), max_short_side=768),
+    # larger images are resized to about 1.15 megapixels
+    "anthropic": EncodingProfile(max_size=(1568, 1568), max_pixels=1_150_000),
+    "qwen": EncodingProfile(max_pixels=1280 * 28 * 28),
+    "gemini": EncodingProfile(max_size=(3072, 3072)),
+    "ollama": EncodingProfile(max_size=(1344, 1344)),
+    "assistant": EncodingProfile(max_size=(1920, 1080)),
+}
+
+
+@dataclass
+class EncodedImage:
+    """An encoded screenshot ready to be attached to a request."""
+
+    data: bytes
+    media_type: str
+    size: Tuple[int, int]
+
+    @property
+    def base64(self):
+        return base64.b64encode(self.data).decode("utf-8")
+
+    @property
+    def data_url(self):
+        return f"data:{self.media_type};base64,{self.base64}"
+
+
+def get_profile(provider):
+    """
+    Return the encoding profile of `provider` with the `OPERATE_IMAGE_*`
+    overrides from the configuration applied.
+    """
+    profile = PROVIDER_PROFILES[provider]
+    overrides = {}
+    if config.image_format:
+        overrides["format"] = config.image_format.upper()
+    if config.image_quality:
+        overrides["quality"] = config.image_quality
+    if config.image_max_side:
+        overrides["max_size"] = (config.image_max_side, config.image_max_side)
+    if config.image_grayscale:
+        overrides["grayscale"] = True
+    if config.image_colors:
+        overrides["colors"] = config.image_colors
+    return replace(profile, **overrides) if overrides else profile
+
+
+def target_size(size, profile):
+    """Largest size within the profile's budget with the aspect ratio of `size`."""
+    width, height = size
+    scale = 1.0
+    if profile.max_size:
+        scale = min(scale, profile.max_size[0] / width, profile.max_size[1] / height)
+    if profile.max_pixels:
+        scale = min(scale, math.sqrt(profile.max_pixels / (width * height)))
+    if profile.max_short_side:
+        scale = min(scale, profile.max_short_side / min(width, height))
+    if scale >= 1.0:
+        return size
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def estimate_vision_tokens(size, provider):
+    """Rough number of input tokens an image of `size` costs with `provider`."""
+    width, height = size
+    if provider == "openai":
+        tiles = math.ceil(width / 512) * math.ceil(height / 512)
+        return 85 + 170 * tiles
+    if provider == "anthropic":
+        return int(width * height / 750)
+    return None
+
+
+def encode_frame(frame, provider=None, profile=None):
+    """
+    Encode `frame` for `provider` (or with an explicit `profile`) and return
+    an `EncodedImage`. The result is cached on the frame per profile.
+    """
+    if profile is None:
+        profile = get_profile(provider)
+
+    key = ("encoded", profile)
+    if key in frame.cache:
+        return frame.cache[key]
+
+    image = frame.image
+    size = target_size(image.size, profile)
+    if size != image.size:
+        image = image.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+    if profile.grayscale:
+        image = image.convert("L")
+    if profile.colors:
+        image = image.quantize(colors=profile.colors)
+
+    params = {"optimize": True} if profile.output_format == "PNG" else {
+        "quality": profile.quality
+    }
+    buffer = io.BytesIO()
+    image.save(buffer, format=profile.output_format, **params)
+    encoded = EncodedImage(buffer.getvalue(), profile.media_type, size)
+    frame.cache[key] = encoded
+
+    if config.verbose:
+        print(
+            "[encode_frame]",
+            provider or "custom",
+            f"{frame.width}x{frame.height} -> {size[0]}x{size[1]}",
+            profile.output_format,
+            len(encoded.data),
+            "bytes, ~tokens",
+            estimate_vision_tokens(size, provider),
+        )
+    return encoded
@@ -0,0 +1,139 @@
+"""
+Background frame grabber.
+
+Samples the screen on a daemon thread at a fixed rate into a small ring buffer
+of preallocated frames, so settle detection and agent steps can pick up fresh,
+already captured frames instead of capturing synchronously.
+"""
+
+import platform
+import threading
+import time
+
+import numpy as np
+
+from operate.config import Config
+from operate.utils.screenshot import Frame, capture_frame, capture_pixels
+
+# Load configuration
+config = Config()
+
+_frame_grabber = None
+
+
+class FrameGrabber(threading.Thread):
+    """
+    Capture thread writing into a fixed-size ring buffer.
+
+    Every slot is allocated once up front and overwritten in place. Readers
+    copy a slot out while holding the lock that the writer needs to publish
+    the next frame, and the writer never touches the two newest slots, so a
+    reader never sees a half-written frame.
+    """
+
+    def __init__(self, fps=10, buffer_size=4):
+        super().__init__(name="frame-grabber", daemon=True)
+        self.interval = 1.0 / fps
+        # the slot being written plus the two newest published frames
+        self.buffer_size = max(3, buffer_size)
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._slots = None
+        self._timestamps = [0.0] * self.buffer_size
+        self._count = 0
+        self._use_backend = platform.system() == "Linux"
+
+    def _allocate(self, shape):
+        self._slots = [
+            np.empty(shape, dtype=np.uint8) for _ in range(self.buffer_size)
+        ]
+        self._timestamps = [0.0] * self.buffer_size
+        self._count = 0
+
+    def _grab_into(self, out):
+        if self._use_backend:
+            capture_pixels(out=out)
+        else:
+            np.copyto(out, capture_frame(region=False).pixels)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            started = time.time()
+            try:
+                if self._slots is None:
+                    first = capture_frame(region=False)
+                    with self._condition:
+                        self._allocate(first.pixels.shape)
+                index = self._count % self.buffer_size
+                self._grab_into(self._slots[index])
+                with self._condition:
+                    self._timestamps[index] = started
+                    self._count += 1
+                    self._condition.notify_all()
+            except Exception as e:
+                # e.g. the resolution changed, start over with new slots
+                if config.verbose:
+                    print("[FrameGrabber] capture failed:", e)
+                with self._condition:
+                    self._slots = None
+                    self._count = 0
+            elapsed = time.time() - started
+            self._stop_event.wait(max(0.0, self.interval - elapsed))
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _newest(self, offset=0):
+        index = (self._count - 1 - offset) % self.buffer_size
+        return self._slots[index], self._timestamps[index]
+
+    def latest(self, newer_than=0.0, timeout=2.0):
+        """
+        Return a copy of the newest frame captured after `newer_than`.
+
+        Waits up to `timeout` seconds for such a frame and returns None if the
+        grabber produced nothing in time.
+        """
+        deadline = time.time() + timeout
+        with self._condition:
+            while True:
+                if self._count and self._newest()[1] > newer_than:
+                    pixels, timestamp = self._newest()
+                    return Frame(pixels.copy(), timestamp)
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+
+
+def start_frame_grabber(fps=None, buffer_size=None):
+    """Start the process-wide frame grabber if it is not running yet."""
+    global _frame_grabber
+    if _frame_grabber is None or not _frame_grabber.is_alive():
+        _frame_grabber = FrameGrabber(
+            fps=fps or config.frame_grabber_fps,
+            buffer_size=buffer_size or config.frame_grabber_buffer_size,
+        )
+        _frame_grabber.start()
+        if config.verbose:
+            print(
+                "[start_frame_grabber] sampling at",
+                1.0 / _frame_grabber.interval,
+                "fps",
+            )
+    return _frame_grabber
+
+
+def stop_frame_grabber():
+    global _frame_grabber
+    if _frame_grabber is not None:
+        _frame_grabber.stop()
+        _frame_grabber.join(timeout=1.0)
+    _frame_grabber = None
+
+
+def get_frame_grabber():
+    """Return the running frame grabber, or None when it is not enabled."""
+    if _frame_grabber is not None and _frame_grabber.is_alive():
+        return _frame_grabber
+    return None
@@ -0,0 +1,78 @@
+"""
+Hybrid grounding: OCR text and YOLO detections of one frame in one index.
+
+OCR finds text but not icons, and splits long labels over several boxes.
+The detector finds icons and whole controls but cannot read. Fusing them
+lets a click name its target by text or by label, and a text OCR could not
+match on its own can still be found as the joined text inside a detected
+control, without asking the model again.
+"""
+
+from operate.utils.label import texts_in_boxes
+from operate.utils.ocr import TextIndex, normalize_text
+
+
+def _corners(box):
+    x1, y1, x2, y2 = box
+    return [[x1, y1], [x2, y1], [x2, y2], [x1, y2]]
+
+
+def _bounds(corners):
+    xs = [point[0] for point in corners]
+    ys = [point[1] for point in corners]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+class GroundingIndex:
+    """
+    Click targets of one frame: the OCR text elements, and the labelled
+    detector boxes with the OCR text found inside them. Detector boxes
+    without text are the icons.
+    """
+
+    def __init__(self, ocr_result, label_coordinates):
+        self.ocr_result = ocr_result
+        self.labels = dict(label_coordinates)
+        self.texts = texts_in_boxes(self.labels, ocr_result)
+        self.text_index = TextIndex(ocr_result)
+        # detector boxes with text, EasyOCR style so `TextIndex` can search them
+        self.controls = [
+            (_corners(self.labels[label]), text, 1.0)
+            for label, text in self.texts.items()
+            if text
+        ]
+        self.control_index = TextIndex(self.controls)
+
+    def locate(self, text=None, label=None, min_score=0.6):
+        """
+        The ``(x1, y1, x2, y2)`` box a click names, or None.
+
+        A known `label` wins. Otherwise `text` is looked up among the OCR
+        elements first, as the OCR-only path does, then among the texts of
+        the detector boxes, which also catches text OCR split over several
+        boxes. A `text` that is itself a label, e.g. "~12", is resolved as one.
+        Both come from the model's JSON and may be numbers, they are read as
+        strings.
+        """
+        label = "" if label is None else str(label).strip()
+        text = "" if text is None else str(text).strip()
+        if label in self.labels:
+            return self.labels[label]
+        if not text:
+            return None
+        if text in self.labels:
+            return self.labels[text]
+
+        index = self.text_index.find(text, min_score)
+        if index is not None:
+            return _bounds(self.ocr_result[index][0])
+        index = self.control_index.find(text, min_score)
+        if index is not None:
+            return _bounds(self.controls[index][0])
+        return None
+
+    def describe(self, text=None, label=None):
+        """Short description of a click target for logs."""
+        if label:
+            return f"label {label}"
+        return f"text {normalize_text(text)!r}"
@@ -1,10 +1,20 @@
-import io
-import base64
-import json
 import os
 import time
-import asyncio
-from PIL import Image, ImageDraw
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import ImageDraw
+
+from operate.utils.screenshot import Frame
+
+# Writes the debug images of `add_labels` off the agent's path
+_debug_writer = None
+_debug_writer_lock = threading.Lock()
+
+# How `suppress_overlaps` decides that a box hides one kept before it
+SUPPRESSION_RULES = ("overlap", "iou", "none")
 
 
 def validate_and_extract_image_data(data):
@@ -52,90 +62,211 @@ def is_overlapping(box1, box2):
     return True
 
 
-def add_labels(base64_data, yolo_model):
-    image_bytes = base64.b64decode(base64_data)
-    image_labeled = Image.open(io.BytesIO(image_bytes))  # Corrected this line
-    image_debug = image_labeled.copy()  # Create a copy for the debug image
-    image_original = (
-        image_labeled.copy()
-    )  # Copy of the original image for base64 return
-
-    results = yolo_model(image_labeled)
-
+def _overlaps(box, others, rule, threshold):
+    """Vectorized `is_overlapping` (rule "overlap") or IoU test of `box` against `others`."""
+    x1, y1, x2, y2 = box
+    if rule == "overlap":
+        return ~(
+            (x1 > others[:, 2])
+            | (others[:, 0] > x2)
+            | (y1 > others[:, 3])
+            | (others[:, 1] > y2)
+        )
+    width = np.minimum(x2, others[:, 2]) - np.maximum(x1, others[:, 0])
+    height = np.minimum(y2, others[:, 3]) - np.maximum(y1, others[:, 1])
+    intersection = np.clip(width, 0, None) * np.clip(height, 0, None)
+    area = (x2 - x1) * (y2 - y1)
+    other_areas = (others[:, 2] - others[:, 0]) * (others[:, 3] - others[:, 1])
+    union = np.maximum(area + other_areas - intersection, 1e-9)
+    return intersection / union > threshold
+
+
+def suppress_overlaps(boxes, rule="overlap", threshold=0.5, max_cells=64):
+    """
+    Greedily keep boxes in the given order, dropping any box that overlaps
+    one already kept, and return the indices of the kept boxes.
+
+    Rules: "overlap" drops boxes that touch or intersect a kept one (what
+    `is_overlapping` checks), "iou" drops boxes whose intersection over union
+    with a kept one exceeds `threshold`, "none" keeps everything.
+
+    Kept boxes are registered in a uniform grid sized after the median box,
+    so each box is only compared with the kept boxes sharing one of its
+    cells, which keeps dense screens with hundreds of detections near
+    linear. Boxes spanning more than `max_cells` cells are compared with
+    every box instead of filling the grid.
+    """
+    if rule not in SUPPRESSION_RULES:
+        raise ValueError(
+            f"Unknown suppression rule '{rule}', expected one of {', '.join(SUPPRESSION_RULES)}"
+        )
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    if rule == "none" or len(boxes) < 2:
+        return list(range(len(boxes)))
+
+    sides = np.maximum(boxes[:, 2:] - boxes[:, :2], 1.0)
+    cell = max(float(np.median(sides)), 16.0)
+    first_cells = np.floor(boxes[:, :2] / cell).astype(np.int64)
+    last_cells = np.floor(boxes[:, 2:] / cell).astype(np.int64)
+
+    grid = defaultdict(list)  # cell -> indices of kept boxes touching it
+    large = []  # kept boxes spanning too many cells to register
+    kept = []
+    for index in range(len(boxes)):
+        (cx1, cy1), (cx2, cy2) = first_cells[index], last_cells[index]
+        span = (cx2 - cx1 + 1) * (cy2 - cy1 + 1)
+        if span > max_cells:
+            # compare with every kept box rather than visiting each cell
+            candidates = kept
+        else:
+            cells = [
+                (x, y) for x in range(cx1, cx2 + 1) for y in range(cy1, cy2 + 1)
+            ]
+            candidates = set(large)
+            for key in cells:
+                candidates.update(grid.get(key, ()))
+            candidates = list(candidates)
+        if candidates and _overlaps(
+            boxes[index], boxes[candidates], rule, threshold
+        ).any():
+            continue
+
+        kept.append(index)
+        if span > max_cells:
+            large.append(index)
+        else:
+            for key in cells:
+                grid[key].append(index)
+    return kept
+
+
+def label_boxes(boxes, suppression="overlap", iou_threshold=0.5, ids=None):
+    """
+    The ``{"~N": (x1, y1, x2, y2)}`` labels `add_labels` draws, without
+    drawing them: the boxes kept by `suppress_overlaps`, numbered in order
+    or by their `ids`.
+    """
+    labels = {}
+    for number, index in enumerate(suppress_overlaps(boxes, suppression, iou_threshold)):
+        labels["~" + str(number if ids is None else ids[index])] = tuple(boxes[index])
+    return labels
+
+
+def add_labels(
+    frame,
+    boxes,
+    suppression="overlap",
+    iou_threshold=0.5,
+    ids=None,
+    debug_dir=None,
+):
+    """
+    Draw a "~N" label on the detected boxes of `frame` that survive
+    `suppress_overlaps` with the `suppression` rule. `boxes` are
+    ``(x1, y1, x2, y2)`` detections, as returned by
+    `operate.utils.workers.yolo_detect`. Labels are numbered in order unless
+    `ids` gives the number of every box, e.g. the ids of tracked elements.
+
+    Returns the labelled image as a new `Frame`, to encode once for the
+    provider, and the coordinates of every label. With `debug_dir`, the
+    original, labelled and debug (every detection) images are also written
+    there as PNGs, on a background thread.
+    """
+    image_labeled = frame.image.copy()  # Draw on a copy, the frame is shared
     draw = ImageDraw.Draw(image_labeled)
-    debug_draw = ImageDraw.Draw(
-        image_debug
-    )  # Create a separate draw object for the debug image
     font_size = 45
 
-    labeled_images_dir = "labeled_images"
-    label_coordinates = {}  # Dictionary to store coordinates
-
-    if not os.path.exists(labeled_images_dir):
-        os.makedirs(labeled_images_dir)
-
-    counter = 0
-    drawn_boxes = []  # List to keep track of boxes already drawn
-    for result in results:
-        if hasattr(result, "boxes"):
-            for det in result.boxes:
-                bbox = det.xyxy[0]
-                x1, y1, x2, y2 = bbox.tolist()
-
-                debug_label = "D_" + str(counter)
-                debug_index_position = (x1, y1 - font_size)
-                debug_draw.rectangle([(x1, y1), (x2, y2)], outline="blue", width=1)
-                debug_draw.text(
-                    debug_index_position,
-                    debug_label,
-                    fill="blue",
-                    font_size=font_size,
-                )
-
-                overlap = any(
-                    is_overlapping((x1, y1, x2, y2), box) for box in drawn_boxes
-                )
-
-                if not overlap:
-                    draw.rectangle([(x1, y1), (x2, y2)], outline="red", width=1)
-                    label = "~" + str(counter)
-                    index_position = (x1, y1 - font_size)
-                    draw.text(
-                        index_position,
-                        label,
-                        fill="red",
-                        font_size=font_size,
-                    )
-
-                    # Add the non-overlapping box to the drawn_boxes list
-                    drawn_boxes.append((x1, y1, x2, y2))
-                    label_coordinates[label] = (x1, y1, x2, y2)
-
-                    counter += 1
-
-    # Save the image
+    label_coordinates = label_boxes(boxes, suppression, iou_threshold, ids)
+    for label, (x1, y1, x2, y2) in label_coordinates.items():
+        draw.rectangle([(x1, y1), (x2, y2)], outline="red", width=1)
+        index_position = (x1, y1 - font_size)
+        draw.text(
+            index_position,
+            label,
+            fill="red",
+            font_size=font_size,
+        )
+
+    labeled = Frame.from_image(image_labeled, frame.timestamp)
+    if debug_dir:
+        _get_debug_writer().submit(
+            save_label_images, frame, labeled, boxes, debug_dir
+        )
+    return labeled, label_coordinates
+
+
+def _get_debug_writer():
+    global _debug_writer
+    with _debug_writer_lock:
+        if _debug_writer is None:
+            _debug_writer = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="label-debug"
+            )
+        return _debug_writer
+
+
+def save_label_images(frame, labeled, boxes, directory):
+    """
+    Write the original and labelled images of one step into `directory`,
+    with a debug image showing every detection, "D_" and its index.
+    """
+    font_size = 45
+    image_debug = frame.image.copy()
+    debug_draw = ImageDraw.Draw(image_debug)
+    for index, (x1, y1, x2, y2) in enumerate(boxes):
+        debug_label = "D_" + str(index)
+        debug_draw.rectangle([(x1, y1), (x2, y2)], outline="blue", width=1)
+        debug_draw.text(
+            (x1, y1 - font_size),
+            debug_label,
+            fill="blue",
+            font_size=font_size,
+        )
+
+    if not os.path.exists(directory):
+        os.makedirs(directory)
     timestamp = time.strftime("%Y%m%d-%H%M%S")
+    labeled.save(os.path.join(directory, f"img_{timestamp}_labeled.png"))
+    image_debug.save(os.path.join(directory, f"img_{timestamp}_debug.png"))
+    frame.save(os.path.join(directory, f"img_{timestamp}_original.png"))
 
-    output_path = os.path.join(labeled_images_dir, f"img_{timestamp}_labeled.png")
-    output_path_debug = os.path.join(labeled_images_dir, f"img_{timestamp}_debug.png")
-    output_path_original = os.path.join(
-        labeled_images_dir, f"img_{timestamp}_original.png"
-    )
-
-    image_labeled.save(output_path)
-    image_debug.save(output_path_debug)
-    image_original.save(output_path_original)
-
-    buffered_original = io.BytesIO()
-    image_original.save(buffered_original, format="PNG")  # I guess this is needed
-    img_base64_original = base64.b64encode(buffered_original.getvalue()).decode("utf-8")
 
-    # Convert image to base64 for return
-    buffered_labeled = io.BytesIO()
-    image_labeled.save(buffered_labeled, format="PNG")  # I guess this is needed
-    img_base64_labeled = base64.b64encode(buffered_labeled.getvalue()).decode("utf-8")
-
-    return img_base64_labeled, label_coordinates
+def texts_in_boxes(label_coordinates, ocr_result):
+    """
+    ``{label: text}`` joining the OCR elements (EasyOCR style
+    ``(box, text, confidence)`` results) centered inside each labelled box,
+    in reading order; empty for boxes without text.
+    """
+    centers = []
+    for box, text, _ in ocr_result or []:
+        xs = [point[0] for point in box]
+        ys = [point[1] for point in box]
+        centers.append(((min(xs) + max(xs)) / 2, (min(ys) + max(ys)) / 2, text))
+
+    texts = {}
+    for label, (x1, y1, x2, y2) in label_coordinates.items():
+        # rows of about 10 pixels, left to right within a row
+        inside = sorted(
+            (int(y // 10), x, text)
+            for x, y, text in centers
+            if x1 <= x <= x2 and y1 <= y <= y2
+        )
+        texts[label] = " ".join(text for _, _, text in inside)
+    return texts
+
+
+def label_table(label_coordinates, image_size, ocr_result=None):
+    """
+    The labels of `add_labels` as ``(label, box, text)`` rows, with the box
+    in fractions of `image_size` and the OCR text inside it, see
+    `texts_in_boxes`.
+    """
+    width, height = image_size
+    texts = texts_in_boxes(label_coordinates, ocr_result)
+    return [
+        (label, (x1 / width, y1 / height, x2 / width, y2 / height), texts[label])
+        for label, (x1, y1, x2, y2) in label_coordinates.items()
+    ]
 
 
 def get_click_position_in_percent(coordinates, image_size):
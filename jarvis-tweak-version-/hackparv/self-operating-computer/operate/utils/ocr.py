@@ -1,19 +1,472 @@
 from operate.config import Config
-from PIL import Image, ImageDraw
+from PIL import ImageDraw
+import asyncio
+import difflib
+import heapq
 import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, defaultdict
 from datetime import datetime
 
+import numpy as np
+
+from operate.utils.ocr_cache import TileCache, tile_digest
+from operate.utils.ocr_engines import create_ocr_engine
+from operate.utils.preprocess import OCRPreprocess, map_result_back, preprocess
+
 # Load configuration
 config = Config()
 
+_ocr_service = None
+_ocr_service_lock = threading.Lock()
+
+
+def tile_spans(length, size, overlap):
+    """
+    Split ``[0, length)`` into overlapping spans of at most `size` and return
+    ``(start, end, core_start, core_end)`` tuples. The cores split every
+    overlap in its middle, so each pixel belongs to exactly one core.
+    """
+    if length <= size:
+        return [(0, length, 0, length)]
+    step = size - overlap
+    starts = list(range(0, length - size, step)) + [length - size]
+    spans = []
+    for index, start in enumerate(starts):
+        end = start + size
+        core_start = 0 if index == 0 else (start + spans[-1][1]) // 2
+        core_end = length if index == len(starts) - 1 else (starts[index + 1] + end) // 2
+        spans.append((start, end, core_start, core_end))
+    return spans
+
+
+def _plain_elements(result, dx=0, dy=0):
+    """EasyOCR results as JSON-friendly tuples, with boxes moved by ``(dx, dy)``."""
+    return [
+        (
+            [[float(x) + dx, float(y) + dy] for x, y in box],
+            str(text),
+            float(confidence),
+        )
+        for box, text, confidence in result
+    ]
+
+
+class OCRService:
+    """
+    A shared OCR engine (see `operate.utils.ocr_engines`), EasyOCR by default.
+
+    Loading the detection and recognition weights takes seconds, so the
+    engine is loaded once, on first use or by `warm_up`, and reused by every
+    provider and step. Calls are serialized, the underlying models are not
+    meant to be used from several threads at once.
+
+    With `processes` set, the engine runs in the worker processes of
+    `operate.utils.workers` instead of this one. With `speculative` set,
+    `start` begins reading a frame right after it is captured, so OCR runs
+    while the model request is in flight and `read_frame` only collects it.
+    Coroutines use `read_frame_async`.
+
+    With a `tile_cache`, frames are read as overlapping tiles whose results
+    are cached by pixel content, so only tiles that changed are recognized
+    again. Text longer than the overlap may come back split over two boxes.
+
+    `preprocessing` (an `OCRPreprocess`) downscales or converts to grayscale
+    images before recognition; boxes are mapped back to the frame.
+    """
+
+    def __init__(
+        self,
+        engine="easyocr",
+        languages=("en",),
+        threads=None,
+        gpu=True,
+        memo_size=8,
+        speculative=False,
+        processes=False,
+        tile_cache=None,
+        tile_size=512,
+        tile_overlap=64,
+        preprocessing=None,
+        engine_options=None,
+    ):
+        self.engine = engine
+        self.engine_options = engine_options or {}
+        self.languages = list(languages)
+        self.threads = threads
+        self.gpu = gpu
+        self.memo_size = memo_size
+        self.speculative = speculative
+        self.processes = processes
+        self.tile_cache = tile_cache
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.preprocessing = preprocessing or OCRPreprocess()
+        self._background = None
+        self._reader = None
+        self._lock = threading.Lock()
+        self._memo_lock = threading.Lock()
+        self._warm_up_thread = None
+        # frame digest -> OCR results of the most recently read frames
+        self._memo = OrderedDict()
+        # frame digest -> Future of a read running in the worker process
+        self._pending = {}
+
+    @property
+    def reader(self):
+        with self._lock:
+            return self._load()
+
+    def _load(self):
+        if self._reader is None:
+            started = time.time()
+            self._reader = create_ocr_engine(
+                self.engine,
+                self.languages,
+                self.threads,
+                self.gpu,
+                **self.engine_options,
+            ).load()
+            if config.verbose:
+                print(
+                    "[OCRService] loaded",
+                    self.engine,
+                    self.languages,
+                    "in",
+                    round(time.time() - started, 2),
+                    "s",
+                )
+        return self._reader
+
+    def readtext(self, image):
+        """Run the engine on `image`, an RGB or grayscale array, and return its results."""
+        with self._lock:
+            return self._load().readtext(image)
+
+    @property
+    def engine_args(self):
+        """Arguments of `operate.utils.workers.load_ocr_engine` for this engine."""
+        return (
+            self.engine,
+            self.languages,
+            self.threads,
+            self.gpu,
+            self.engine_options,
+        )
+
+    def _submit(self, pixels):
+        from operate.utils.workers import get_process_pool, ocr_readtext
+
+        engine, languages, threads, gpu, options = self.engine_args
+        return get_process_pool("ocr").submit(
+            ocr_readtext, engine, pixels, languages, threads, gpu, options
+        )
+
+    def _recognize(self, pixels):
+        """
+        Start recognizing `pixels` and return a callable yielding the results,
+        in the coordinates of `pixels` whatever the preprocessing did.
+        """
+        prepared, transform = preprocess(pixels, self.preprocessing)
+        if self.processes:
+            pending = self._submit(prepared).result
+        else:
+            pending = lambda: self.readtext(prepared)
+        return lambda: map_result_back(pending(), transform)
+
+    def _read(self, frame):
+        if self.tile_cache is not None:
+            return self._read_tiles(frame)
+        return self._recognize(frame.pixels)()
+
+    def _read_tiles(self, frame):
+        """Read `frame` tile by tile, recognizing only tiles missing from the cache."""
+        namespace = (
+            f"{self.engine};{','.join(self.languages)};{self.preprocessing.key}"
+        )
+        pixels = frame.pixels
+        result = []
+        pending = []
+        for y1, y2, core_y1, core_y2 in tile_spans(
+            frame.height, self.tile_size, self.tile_overlap
+        ):
+            for x1, x2, core_x1, core_x2 in tile_spans(
+                frame.width, self.tile_size, self.tile_overlap
+            ):
+                tile = pixels[y1:y2, x1:x2]
+                key = tile_digest(tile, namespace)
+                elements = self.tile_cache.get(key)
+                if elements is None:
+                    # submit every miss first, so the worker pool reads them in parallel
+                    elements = self._recognize(np.ascontiguousarray(tile))
+                pending.append((key, elements, x1, y1, (core_x1, core_y1, core_x2, core_y2)))
+
+        recognized = 0
+        for key, elements, x1, y1, core in pending:
+            if callable(elements):
+                elements = _plain_elements(elements())
+                self.tile_cache.put(key, elements)
+                recognized += 1
+            for element in _plain_elements(elements, x1, y1):
+                # keep a box only in the tile whose core holds its center
+                xs = [point[0] for point in element[0]]
+                ys = [point[1] for point in element[0]]
+                center_x = (min(xs) + max(xs)) / 2
+                center_y = (min(ys) + max(ys)) / 2
+                if core[0] <= center_x < core[2] and core[1] <= center_y < core[3]:
+                    result.append(element)
+
+        if config.verbose:
+            print(
+                "[OCRService] recognized",
+                recognized,
+                "of",
+                len(pending),
+                "tiles, the rest came from the cache",
+            )
+        return result
+
+    def _background_executor(self):
+        if self._background is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            self._background = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="ocr"
+            )
+        return self._background
+
+    def start(self, frame):
+        """
+        Start reading `frame` in the background without waiting for it.
+        Does nothing unless the service is `speculative`.
+        """
+        if not self.speculative:
+            return
+        key = frame.digest
+        with self._memo_lock:
+            if key in self._memo or key in self._pending:
+                return
+            # a thread waits on the worker process and maps the results back
+            self._pending[key] = self._background_executor().submit(self._read, frame)
+            # Reads nobody collected, e.g. the model did not click, are dropped
+            while len(self._pending) > self.memo_size:
+                self._pending.pop(next(iter(self._pending))).cancel()
+        if config.verbose:
+            print("[OCRService] started speculative OCR of frame", key[:8])
+
+    def read_frame(self, frame):
+        """
+        OCR results for a captured `frame`, memoized by its content hash.
 
-def get_text_element(result, search_text, image_path):
+        Every click of a response, and any retry within the same step, reads
+        the same screen, so only the first call runs the recognizer. Recaptures
+        of an unchanged screen hit the memo too.
+        """
+        key = frame.digest
+        with self._memo_lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                if config.verbose:
+                    print("[OCRService] reusing the OCR results of frame", key[:8])
+                return self._memo[key]
+            future = self._pending.pop(key, None)
+
+        started = time.time()
+        if future is not None:
+            result = future.result()
+        else:
+            result = self._read(frame)
+        if config.verbose:
+            print(
+                "[OCRService] read frame",
+                key[:8],
+                "after waiting",
+                round(time.time() - started, 2),
+                "s,",
+                len(result),
+                "elements",
+            )
+
+        with self._memo_lock:
+            self._memo[key] = result
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return result
+
+    async def read_frame_async(self, frame):
+        """`read_frame` for coroutines, waiting on a thread instead of the event loop."""
+        return await asyncio.to_thread(self.read_frame, frame)
+
+    def warm_up(self, background=True):
+        """
+        Load the weights and run one tiny inference so the first real call
+        does not pay for lazy initialization. Runs on a daemon thread unless
+        `background` is False.
+        """
+        if background:
+            if self._warm_up_thread is None:
+                self._warm_up_thread = threading.Thread(
+                    target=self._warm_up, name="ocr-warm-up", daemon=True
+                )
+                self._warm_up_thread.start()
+            return self._warm_up_thread
+        self._warm_up()
+
+    def _warm_up(self):
+        pixels = np.full((32, 128, 3), 255, dtype=np.uint8)
+        try:
+            if self.processes:
+                self._submit(pixels).result()
+            else:
+                self.readtext(pixels)
+        except Exception as e:
+            if config.verbose:
+                print("[OCRService] warm up failed:", e)
+
+
+def get_tile_cache():
+    """A `TileCache` sized and placed according to `Config`."""
+    return TileCache(
+        max_bytes=config.ocr_cache_mb * 1024 * 1024,
+        directory=config.ocr_cache_dir or None,
+    )
+
+
+def get_ocr_service():
+    """Return the process-wide `OCRService`, configured from `Config`."""
+    global _ocr_service
+    with _ocr_service_lock:
+        if _ocr_service is None:
+            engine_options = {}
+            if config.ocr_engine == "onnx":
+                engine_options = {
+                    "det_model_path": config.ocr_onnx_det_model,
+                    "rec_model_path": config.ocr_onnx_rec_model,
+                }
+            _ocr_service = OCRService(
+                engine=config.ocr_engine,
+                engine_options=engine_options,
+                languages=config.ocr_languages,
+                threads=config.ocr_threads,
+                gpu=config.ocr_gpu,
+                # hybrid grounding detects while OCR runs
+                speculative=config.ocr_speculative or config.grounding == "hybrid",
+                processes=config.vision_workers > 0,
+                tile_cache=get_tile_cache() if config.ocr_tiles else None,
+                tile_size=config.ocr_tile_size,
+                preprocessing=OCRPreprocess(
+                    scale=config.ocr_scale, grayscale=config.ocr_grayscale
+                ),
+            )
+        return _ocr_service
+
+
+def normalize_text(text):
+    """Lowercase `text`, fold unicode variants and keep only words separated by single spaces."""
+    text = unicodedata.normalize("NFKC", str(text)).lower()
+    return " ".join(re.findall(r"\w+", text))
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class TextIndex:
     """
-    Searches for a text element in the OCR results and returns its index. Also draws bounding boxes on the image.
+    Fuzzy lookup over the text elements of one OCR result.
+
+    Each element's normalized text is split into character trigrams and put
+    in an inverted index, so a query only scores the elements sharing
+    trigrams with it instead of every box on screen. Candidates are ranked by
+    match quality (exact, contained, then fuzzy), with OCR confidence and box
+    size as tie breakers.
+    """
+
+    def __init__(self, result):
+        self.result = result
+        self.texts = [normalize_text(element[1]) for element in result]
+        self.postings = defaultdict(list)
+        for index, text in enumerate(self.texts):
+            for gram in trigrams(text):
+                self.postings[gram].append(index)
+        areas = [self._area(element[0]) for element in result]
+        largest = max(areas, default=0) or 1
+        self.sizes = [area / largest for area in areas]
+
+    @staticmethod
+    def _area(box):
+        xs = [point[0] for point in box]
+        ys = [point[1] for point in box]
+        return (max(xs) - min(xs)) * (max(ys) - min(ys))
+
+    @staticmethod
+    def match_quality(query, text):
+        """How well `text` matches `query`, between 0 and 1."""
+        if not query or not text:
+            return 0.0
+        if text == query:
+            return 1.0
+        if query in text:
+            # a whole word match beats a match inside a longer word
+            whole_word = f" {query} " in f" {text} "
+            return (0.85 if whole_word else 0.75) + 0.1 * len(query) / len(text)
+        if text in query:
+            # OCR split the label over several boxes
+            return 0.7 * len(text) / len(query)
+        return 0.9 * difflib.SequenceMatcher(None, query, text).ratio()
+
+    def search(self, search_text, limit=5, candidates=50):
+        """
+        Return up to `limit` ``(score, index)`` pairs, best first.
+
+        Only the `candidates` elements sharing the most trigrams with the query
+        are scored.
+        """
+        query = normalize_text(search_text)
+        if not query:
+            return []
+        shared = defaultdict(int)
+        for gram in trigrams(query):
+            for index in self.postings.get(gram, ()):
+                shared[index] += 1
+        shortlist = heapq.nlargest(candidates, shared, key=shared.get)
+
+        ranked = []
+        for index in shortlist:
+            quality = self.match_quality(query, self.texts[index])
+            confidence = float(self.result[index][2]) if len(self.result[index]) > 2 else 1.0
+            score = quality * (0.9 + 0.05 * confidence + 0.05 * self.sizes[index])
+            ranked.append((score, index))
+        return heapq.nlargest(limit, ranked)
+
+    def find(self, search_text, min_score=0.6):
+        """Index of the best matching element, or None when nothing matches well enough."""
+        matches = self.search(search_text, limit=1)
+        if matches and matches[0][0] >= min_score:
+            return matches[0][1]
+        return None
+
+
+def get_text_index(result, frame):
+    """The `TextIndex` of an OCR result, built once and cached on its frame."""
+    cached = frame.cache.get("text_index")
+    if cached is None or cached.result is not result:
+        cached = TextIndex(result)
+        frame.cache["text_index"] = cached
+    return cached
+
+
+def get_text_element(result, search_text, frame):
+    """
+    Searches for the text element best matching `search_text` in the OCR results and returns its index. Also draws bounding boxes on the image.
     Args:
         result (list): The list of results returned by EasyOCR.
         search_text (str): The text to search for in the OCR results.
-        image_path (str): Path to the original image.
+        frame (Frame): The captured frame the OCR ran on.
 
     Returns:
         int: The index of the element containing the search text.
@@ -29,23 +482,25 @@ def get_text_element(result, search_text, image_path):
         if not os.path.exists(ocr_dir):
             os.makedirs(ocr_dir)
 
-        # Open the original image
-        image = Image.open(image_path)
+        # Draw on a copy of the captured frame
+        image = frame.image.copy()
         draw = ImageDraw.Draw(image)
 
-    found_index = None
-    for index, element in enumerate(result):
-        text = element[1]
-        box = element[0]
+    text_index = get_text_index(result, frame)
+    found_index = text_index.find(search_text)
 
-        if config.verbose:
+    if config.verbose:
+        for element in result:
             # Draw bounding box in blue
-            draw.polygon([tuple(point) for point in box], outline="blue")
-
-        if search_text in text:
-            found_index = index
-            if config.verbose:
-                print("[get_text_element][loop] found search_text, index:", index)
+            draw.polygon([tuple(point) for point in element[0]], outline="blue")
+        for score, index in text_index.search(search_text):
+            print(
+                "[get_text_element] candidate",
+                index,
+                repr(result[index][1]),
+                "score",
+                round(score, 3),
+            )
 
     if found_index is not None:
         if config.verbose:
@@ -63,13 +518,13 @@ def get_text_element(result, search_text, image_path):
     raise Exception("The text element was not found in the image")
 
 
-def get_text_coordinates(result, index, image_path):
+def get_text_coordinates(result, index, frame):
     """
     Gets the coordinates of the text element at the specified index as a percentage of screen width and height.
     Args:
         result (list): The list of results returned by EasyOCR.
         index (int): The index of the text element in the results list.
-        image_path (str): Path to the screenshot image.
+        frame (Frame): The captured frame the OCR ran on.
 
     Returns:
         dict: A dictionary containing the 'x' and 'y' coordinates as percentages of the screen width and height.
@@ -89,9 +544,8 @@ def get_text_coordinates(result, index, image_path):
     center_x = (min_x + max_x) / 2
     center_y = (min_y + max_y) / 2
 
-    # Get image dimensions
-    with Image.open(image_path) as img:
-        width, height = img.size
+    # The frame already knows its dimensions
+    width, height = frame.size
 
     # Convert to percentages
     percent_x = round((center_x / width), 3)
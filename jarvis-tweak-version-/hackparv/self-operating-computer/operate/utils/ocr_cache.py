@@ -0,0 +1,97 @@
+"""
+Content-addressed cache of OCR results for screen tiles.
+
+Most of the screen (taskbar, menu bar, browser chrome, sidebars) looks the
+same from one step to the next. Results are stored under a hash of the tile's
+pixels, so an unchanged tile is never read twice, wherever it was captured.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+def tile_digest(pixels, namespace=""):
+    """Hash of a tile's exact pixels (and shape), salted with `namespace`."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(namespace.encode("utf-8"))
+    digest.update(repr(pixels.shape).encode("utf-8"))
+    for row in pixels:
+        digest.update(row.tobytes())
+    return digest.hexdigest()
+
+
+def _result_bytes(elements):
+    # rough in-memory footprint: the text plus the box and tuple overhead
+    return sum(200 + len(element[1]) for element in elements) + 64
+
+
+class TileCache:
+    """
+    LRU of OCR results per tile with a byte budget, optionally backed by a
+    directory of JSON files that survives across runs.
+
+    Cached elements use tile-relative coordinates, ``(box, text, confidence)``
+    with `box` a list of four ``[x, y]`` points, like EasyOCR returns them.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        if self.directory:
+            try:
+                with open(self._path(key), "r", encoding="utf-8") as file:
+                    elements = [tuple(element) for element in json.load(file)]
+            except (OSError, ValueError):
+                elements = None
+            if elements is not None:
+                self._store(key, elements)
+                with self._lock:
+                    self.hits += 1
+                return elements
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, elements):
+        self._store(key, elements)
+        if self.directory:
+            path = self._path(key)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                temporary = path + ".tmp"
+                with open(temporary, "w", encoding="utf-8") as file:
+                    json.dump(elements, file)
+                os.replace(temporary, path)
+            except OSError:
+                pass
+
+    def _store(self, key, elements):
+        size = _result_bytes(elements)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= _result_bytes(self._entries.pop(key))
+            self._entries[key] = elements
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= _result_bytes(evicted)
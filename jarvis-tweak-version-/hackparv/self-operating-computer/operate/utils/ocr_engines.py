@@ -0,0 +1,207 @@
+"""
+OCR engines.
+
+Every engine takes an RGB (or grayscale) array and returns EasyOCR style
+results: a list of ``(box, text, confidence)`` with `box` the four ``[x, y]``
+corners of the text. Engine packages are imported when an engine is first
+loaded, so only the selected one has to be installed.
+
+This module does not import the configuration, it is also loaded by the
+worker processes of `operate.utils.workers`.
+"""
+
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+# Tesseract names its language packs differently
+TESSERACT_LANGUAGES = {
+    "en": "eng",
+    "de": "deu",
+    "fr": "fra",
+    "es": "spa",
+    "it": "ita",
+    "pt": "por",
+    "nl": "nld",
+    "ru": "rus",
+    "ja": "jpn",
+    "ko": "kor",
+    "ch_sim": "chi_sim",
+    "ch_tra": "chi_tra",
+}
+
+
+class OCREngine(ABC):
+    """Base class: `load` the models once, then `readtext` any number of images."""
+
+    name = None
+
+    def __init__(self, languages=("en",), threads=None, gpu=True):
+        self.languages = list(languages)
+        self.threads = threads
+        self.gpu = gpu
+
+    @abstractmethod
+    def load(self):
+        """Load the models and return the engine."""
+
+    @abstractmethod
+    def readtext(self, pixels):
+        """EasyOCR style results for an RGB or grayscale array."""
+
+
+class EasyOCREngine(OCREngine):
+    """EasyOCR (CRAFT detection + CRNN recognition) on PyTorch, GPU when available."""
+
+    name = "easyocr"
+
+    def load(self):
+        import easyocr
+
+        if self.threads:
+            import torch
+
+            torch.set_num_threads(self.threads)
+        self._reader = easyocr.Reader(self.languages, gpu=self.gpu)
+        return self
+
+    def readtext(self, pixels):
+        return self._reader.readtext(pixels)
+
+
+class TesseractEngine(OCREngine):
+    """
+    A local Tesseract through `pytesseract`, CPU only.
+
+    Tesseract reports single words; words on the same line closer than about
+    one line height are merged into one element, like EasyOCR groups them.
+    """
+
+    name = "tesseract"
+
+    def load(self):
+        import pytesseract
+
+        self._tesseract = pytesseract
+        self._language = "+".join(
+            TESSERACT_LANGUAGES.get(language, language) for language in self.languages
+        )
+        # fails early when the tesseract binary is missing
+        pytesseract.get_tesseract_version()
+        return self
+
+    def readtext(self, pixels):
+        # sparse text: UI labels are scattered rather than laid out in paragraphs
+        options = "--psm 11"
+        if self.threads:
+            options += f" -c omp_thread_limit={self.threads}"
+        data = self._tesseract.image_to_data(
+            np.ascontiguousarray(pixels),
+            lang=self._language,
+            config=options,
+            output_type=self._tesseract.Output.DICT,
+        )
+
+        results = []
+        current = None
+        for i, text in enumerate(data["text"]):
+            text = text.strip()
+            confidence = float(data["conf"][i])
+            if not text or confidence < 0:
+                continue
+            left, top = data["left"][i], data["top"][i]
+            right, bottom = left + data["width"][i], top + data["height"][i]
+            line = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            if (
+                current is not None
+                and current["line"] == line
+                and left - current["right"] <= max(bottom - top, current["bottom"] - current["top"])
+            ):
+                current["text"] += " " + text
+                current["right"] = max(current["right"], right)
+                current["top"] = min(current["top"], top)
+                current["bottom"] = max(current["bottom"], bottom)
+                current["confidences"].append(confidence)
+                continue
+            if current is not None:
+                results.append(self._element(current))
+            current = {
+                "line": line,
+                "text": text,
+                "left": left,
+                "top": top,
+                "right": right,
+                "bottom": bottom,
+                "confidences": [confidence],
+            }
+        if current is not None:
+            results.append(self._element(current))
+        return results
+
+    @staticmethod
+    def _element(word):
+        left, top, right, bottom = word["left"], word["top"], word["right"], word["bottom"]
+        box = [[left, top], [right, top], [right, bottom], [left, bottom]]
+        confidence = sum(word["confidences"]) / len(word["confidences"]) / 100.0
+        return box, word["text"], confidence
+
+
+class ONNXEngine(OCREngine):
+    """
+    PaddleOCR models on ONNX Runtime through `rapidocr-onnxruntime`, made for
+    CPU-only hosts. `det_model_path` and `rec_model_path` swap in other
+    exported models, e.g. int8 quantized ones.
+    """
+
+    name = "onnx"
+
+    def __init__(
+        self,
+        languages=("en",),
+        threads=None,
+        gpu=True,
+        det_model_path=None,
+        rec_model_path=None,
+    ):
+        super().__init__(languages, threads, gpu)
+        self.det_model_path = det_model_path
+        self.rec_model_path = rec_model_path
+
+    def load(self):
+        from rapidocr_onnxruntime import RapidOCR
+
+        options = {}
+        if self.det_model_path:
+            options["det_model_path"] = self.det_model_path
+        if self.rec_model_path:
+            options["rec_model_path"] = self.rec_model_path
+        if self.threads:
+            options["intra_op_num_threads"] = self.threads
+        self._engine = RapidOCR(**options)
+        return self
+
+    def readtext(self, pixels):
+        if pixels.ndim == 2:
+            pixels = np.stack([pixels] * 3, axis=2)
+        else:
+            # RapidOCR expects OpenCV's BGR channel order
+            pixels = np.ascontiguousarray(pixels[:, :, ::-1])
+        result, _ = self._engine(pixels)
+        return [
+            ([[float(x), float(y)] for x, y in box], text, float(confidence))
+            for box, text, confidence in (result or [])
+        ]
+
+
+OCR_ENGINES = {
+    engine.name: engine for engine in (EasyOCREngine, TesseractEngine, ONNXEngine)
+}
+
+
+def create_ocr_engine(name, languages=("en",), threads=None, gpu=True, **options):
+    """Instantiate (without loading) the engine registered under `name`."""
+    if name not in OCR_ENGINES:
+        raise ValueError(
+            f"Unknown OCR engine '{name}', expected one of {', '.join(OCR_ENGINES)}"
+        )
+    return OCR_ENGINES[name](languages, threads, gpu, **options)
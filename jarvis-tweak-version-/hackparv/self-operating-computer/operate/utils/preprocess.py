@@ -0,0 +1,77 @@
+"""
+Image preprocessing before OCR.
+
+Recognizing a downscaled grayscale image is much cheaper than a full
+resolution RGB one, and for the large UI text agents click on it is often
+just as accurate. Every preprocessing step is recorded in a `Transform`, so
+the boxes found on the smaller image map back to exact frame coordinates.
+"""
+
+from dataclasses import dataclass
+import numpy as np
+from PIL import Image
+
+
+@dataclass(frozen=True)
+class OCRPreprocess:
+    """
+    Attributes:
+        scale (float): Resize factor applied before OCR, 1.0 keeps the resolution.
+        grayscale (bool): Recognize a single channel image.
+    """
+
+    scale: float = 1.0
+    grayscale: bool = False
+
+    @property
+    def key(self):
+        """Short description used to keep cached results of different settings apart."""
+        return f"scale={self.scale:g},gray={int(self.grayscale)}"
+
+
+@dataclass(frozen=True)
+class Transform:
+    """Maps points of a preprocessed image back to the source image."""
+
+    scale_x: float = 1.0
+    scale_y: float = 1.0
+
+    def to_source(self, x, y):
+        return x / self.scale_x, y / self.scale_y
+
+
+def preprocess(pixels, options):
+    """
+    Apply `options` to an RGB array and return ``(pixels, transform)``.
+    Returns the input untouched, with an identity transform, when there is
+    nothing to do.
+    """
+    height, width = pixels.shape[:2]
+    scale_x = scale_y = 1.0
+    if options.scale != 1.0 or options.grayscale:
+        image = Image.fromarray(np.ascontiguousarray(pixels))
+        if options.grayscale:
+            image = image.convert("L")
+        if options.scale != 1.0:
+            size = (
+                max(1, round(width * options.scale)),
+                max(1, round(height * options.scale)),
+            )
+            image = image.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+            # the exact ratios, after rounding the size to whole pixels
+            scale_x, scale_y = size[0] / width, size[1] / height
+        pixels = np.asarray(image)
+
+    return pixels, Transform(scale_x, scale_y)
+
+
+def map_result_back(result, transform):
+    """
+    Move the boxes of an EasyOCR style result, ``(box, text, confidence)``
+    tuples, from the preprocessed image back onto the source image.
+    """
+    mapped = []
+    for box, text, confidence in result:
+        points = [list(transform.to_source(float(x), float(y))) for x, y in box]
+        mapped.append((points, str(text), float(confidence)))
+    return mapped
@@ -1,42 +1,556 @@
+import base64
+import hashlib
+import io
 import os
 import platform
 import subprocess
+import tempfile
+import threading
+import time
+
+import numpy as np
 import pyautogui
 from PIL import Image, ImageDraw, ImageGrab
 import Xlib.display
+import Xlib.error
 import Xlib.X
 import Xlib.Xutil  # not sure if Xutil is necessary
 
+from operate.config import Config
+from operate.exceptions import CaptureBackendError
+from operate.utils.style import ANSI_BRIGHT_MAGENTA, ANSI_GREEN, ANSI_RESET
+
+# Load configuration
+config = Config()
+
+
+class Frame:
+    """
+    An in-memory screen capture.
+
+    Holds the raw RGB pixels of the screen as a ``(height, width, 3)`` uint8
+    array together with the time it was captured. The PIL image and any
+    encoded representation (PNG, JPEG, base64) are produced lazily on first
+    use and cached on the frame, so every consumer of the same capture shares
+    a single decode and a single encode per format.
+
+    Attributes:
+        cache (dict): Data derived from the pixels (hashes, OCR results...),
+            keyed by whoever computed it.
+        unchanged (bool): Set by the agent loop when the screen looks the same
+            as in the previous step.
+        origin (tuple): Position ``(x, y)`` of the frame's top left corner on
+            the screen, for frames that only cover part of it.
+        screen_size (tuple): Size ``(width, height)`` of the whole screen in
+            the frame's pixels.
+    """
+
+    def __init__(self, pixels, timestamp=None, origin=(0, 0), screen_size=None):
+        self.pixels = pixels
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.origin = origin
+        self.screen_size = self.size if screen_size is None else screen_size
+        self.cache = {}
+        self.unchanged = False
+        self._image = None
+        self._encoded = {}
+
+    @classmethod
+    def from_image(cls, image, timestamp=None):
+        """Build a frame from a PIL image, dropping any alpha channel."""
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        frame = cls(np.asarray(image), timestamp)
+        frame._image = image
+        return frame
+
+    @property
+    def width(self):
+        return self.pixels.shape[1]
+
+    @property
+    def height(self):
+        return self.pixels.shape[0]
+
+    @property
+    def size(self):
+        """Size of the frame as ``(width, height)``, like ``PIL.Image.size``."""
+        return self.width, self.height
+
+    @property
+    def digest(self):
+        """Hash of the exact pixel content, computed once per frame."""
+        if "digest" not in self.cache:
+            pixels = np.ascontiguousarray(self.pixels)
+            self.cache["digest"] = hashlib.blake2b(
+                memoryview(pixels).cast("B"), digest_size=16
+            ).hexdigest()
+        return self.cache["digest"]
+
+    @property
+    def is_cropped(self):
+        return self.origin != (0, 0) or self.size != self.screen_size
+
+    def crop(self, box):
+        """
+        Return a new frame with the ``(x1, y1, x2, y2)`` part of this one,
+        clipped to its bounds. The crop remembers where it sits on the screen.
+        """
+        x1, y1, x2, y2 = box
+        x1, y1 = max(0, int(x1)), max(0, int(y1))
+        x2, y2 = min(self.width, int(x2)), min(self.height, int(y2))
+        if x2 <= x1 or y2 <= y1:
+            raise ValueError(f"Crop box {box} is outside of the frame")
+        pixels = np.ascontiguousarray(self.pixels[y1:y2, x1:x2])
+        origin = (self.origin[0] + x1, self.origin[1] + y1)
+        return Frame(pixels, self.timestamp, origin, self.screen_size)
+
+    def to_screen(self, x, y):
+        """
+        Map a position given as fractions of this frame's width and height to
+        fractions of the whole screen, the unit `click_at_percentage` expects.
+        """
+        screen_width, screen_height = self.screen_size
+        return (
+            (self.origin[0] + x * self.width) / screen_width,
+            (self.origin[1] + y * self.height) / screen_height,
+        )
+
+    def from_screen(self, x, y):
+        """Inverse of `to_screen`: map fractions of the screen to fractions of this frame."""
+        screen_width, screen_height = self.screen_size
+        return (
+            (x * screen_width - self.origin[0]) / self.width,
+            (y * screen_height - self.origin[1]) / self.height,
+        )
+
+    @property
+    def image(self):
+        """The frame as a PIL image. Treat it as read-only; copy before drawing."""
+        if self._image is None:
+            self._image = Image.fromarray(self.pixels)
+        return self._image
+
+    def encode(self, format="PNG", **params):
+        """
+        Encode the frame into ``format`` and return the raw bytes.
+
+        Extra keyword arguments are passed to ``PIL.Image.save``. The result is
+        cached per format and parameters.
+        """
+        key = (format.upper(), tuple(sorted(params.items())))
+        if key not in self._encoded:
+            buffer = io.BytesIO()
+            self.image.save(buffer, format=format, **params)
+            self._encoded[key] = buffer.getvalue()
+        return self._encoded[key]
+
+    def base64(self, format="PNG", **params):
+        """Encode the frame and return it as a base64 string."""
+        return base64.b64encode(self.encode(format, **params)).decode("utf-8")
+
+    @property
+    def png_bytes(self):
+        return self.encode("PNG")
+
+    def save(self, file_path):
+        """Write the frame to disk, reusing a cached encoding when possible."""
+        extension = os.path.splitext(file_path)[1].lower()
+        format = "JPEG" if extension in (".jpg", ".jpeg") else "PNG"
+        with open(file_path, "wb") as file:
+            file.write(self.encode(format))
+
+
+CAPTURE_BACKENDS = ("auto", "pil", "xshm")
+CHANGE_NOTIFICATIONS = ("auto", "damage", "poll")
+
+_capture_backend = None
+_capture_lock = threading.Lock()
+_damage_monitor = None
+_damage_unavailable = False
+# Xlib connection used to find the focused window, opened once
+_window_display = None
+_window_display_lock = threading.Lock()
+
+
+class PILCapture:
+    """
+    Linux capture through Pillow's `ImageGrab`, sized with Xlib.
+
+    The Xlib display connection is opened once and kept for the lifetime of
+    the process instead of once per screenshot.
+    """
+
+    def __init__(self):
+        # Use xlib to prevent scrot dependency for Linux
+        self._display = Xlib.display.Display()
+
+    @property
+    def size(self):
+        geometry = self._display.screen().root.get_geometry()
+        return geometry.width, geometry.height
+
+    def capture(self, out=None):
+        width, height = self.size
+        screenshot = ImageGrab.grab(bbox=(0, 0, width, height))
+        pixels = np.asarray(screenshot.convert("RGB"))
+        if out is None:
+            return pixels
+        np.copyto(out, pixels)
+        return out
+
+    def close(self):
+        self._display.close()
+
+
+def get_capture_backend():
+    """
+    Return the process-wide Linux capture backend, creating it on first use.
+
+    `config.capture_backend` selects it: "xshm" requires MIT-SHM, "pil" is
+    the Xlib + `ImageGrab` path and "auto" tries MIT-SHM first.
+    """
+    global _capture_backend
+    if _capture_backend is not None:
+        return _capture_backend
+
+    name = config.capture_backend
+    if name not in CAPTURE_BACKENDS:
+        raise CaptureBackendError(
+            f"Unknown capture backend '{name}', expected one of {', '.join(CAPTURE_BACKENDS)}"
+        )
+
+    if name in ("auto", "xshm"):
+        try:
+            from operate.utils.x11 import XShmCapture
+
+            _capture_backend = XShmCapture()
+        except CaptureBackendError as e:
+            if name == "xshm":
+                raise
+            if config.verbose:
+                print(
+                    f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_BRIGHT_MAGENTA}[capture] MIT-SHM unavailable ({e}), using ImageGrab {ANSI_RESET}"
+                )
+
+    if _capture_backend is None:
+        _capture_backend = PILCapture()
+
+    if config.verbose:
+        print("[get_capture_backend] using", type(_capture_backend).__name__)
+
+    return _capture_backend
+
+
+def reset_capture_backend():
+    """Close the current capture backend so the next capture reopens it."""
+    global _capture_backend
+    if _capture_backend is not None:
+        try:
+            _capture_backend.close()
+        except Exception:
+            pass
+    _capture_backend = None
+
+
+def capture_pixels(out=None):
+    """
+    Grab the screen through the Linux capture backend as an RGB array.
+
+    Serialized with a lock, since the background frame grabber and the agent
+    loop share one backend and one shared memory segment.
+    """
+    with _capture_lock:
+        try:
+            return get_capture_backend().capture(out=out)
+        except CaptureBackendError:
+            # e.g. the screen was resized under the shared memory segment
+            reset_capture_backend()
+            raise
 
-def capture_screen_with_cursor(file_path):
+
+def parse_capture_region(value):
+    """
+    Parse `config.capture_region`: "screen", "window" or an explicit
+    rectangle "x,y,width,height" in screen coordinates, returned as a box tuple.
+    """
+    value = (value or "screen").strip().lower()
+    if value in ("screen", "window"):
+        return value
+    try:
+        x, y, width, height = (int(part) for part in value.split(","))
+    except ValueError:
+        raise CaptureBackendError(
+            f"Invalid capture region '{value}', expected screen, window or x,y,width,height"
+        )
+    return (x, y, x + width, y + height)
+
+
+def _focused_x11_window_box():
+    global _window_display
+    with _window_display_lock:
+        if _window_display is None:
+            _window_display = Xlib.display.Display()
+        display = _window_display
+        try:
+            root = display.screen().root
+            window = display.get_input_focus().focus
+            if not hasattr(window, "query_tree"):
+                return None
+            # The focus usually sits on a child of the window manager's frame
+            while True:
+                parent = window.query_tree().parent
+                if parent is None or parent.id == root.id:
+                    break
+                window = parent
+            geometry = window.get_geometry()
+            position = root.translate_coords(window, 0, 0)
+        except Xlib.error.ConnectionClosedError:
+            # e.g. the X server restarted, reconnect on the next capture
+            _window_display = None
+            raise
+    return (
+        position.x,
+        position.y,
+        position.x + geometry.width,
+        position.y + geometry.height,
+    )
+
+
+def focused_window_box():
+    """
+    Bounding box ``(x1, y1, x2, y2)`` of the focused top-level window in screen
+    pixels, or None when it cannot be determined. On Linux the X connection
+    is kept open between captures.
+    """
+    user_platform = platform.system()
+    try:
+        if user_platform == "Linux":
+            return _focused_x11_window_box()
+        if user_platform == "Windows":
+            import ctypes
+            import ctypes.wintypes
+
+            rect = ctypes.wintypes.RECT()
+            user32 = ctypes.windll.user32
+            if user32.GetWindowRect(user32.GetForegroundWindow(), ctypes.byref(rect)):
+                return (rect.left, rect.top, rect.right, rect.bottom)
+    except Exception as e:
+        if config.verbose:
+            print("[focused_window_box] could not get the focused window:", e)
+    return None
+
+
+def crop_to_capture_region(frame):
+    """
+    Crop a full screen frame to `config.capture_region`. Frames that are
+    already cropped, and regions that cannot be resolved, are returned as is.
+    """
+    region = parse_capture_region(config.capture_region)
+    if region == "screen" or frame.is_cropped:
+        return frame
+
+    box = focused_window_box() if region == "window" else region
+    if box is None:
+        return frame
+
+    # Screen coordinates are in points while e.g. Retina captures are in pixels
+    screen_width, screen_height = pyautogui.size()
+    scale_x = frame.width / screen_width
+    scale_y = frame.height / screen_height
+    box = (box[0] * scale_x, box[1] * scale_y, box[2] * scale_x, box[3] * scale_y)
+    try:
+        cropped = frame.crop(box)
+    except ValueError:
+        return frame
+    if config.verbose:
+        print("[crop_to_capture_region]", region, "->", cropped.origin, cropped.size)
+    return cropped
+
+
+def capture_frame(region=True):
+    """
+    Capture the screen, with the cursor where the platform allows it, and
+    return it as an in-memory `Frame`. Nothing is written to disk.
+
+    The frame is cropped to `config.capture_region` unless `region` is False.
+    """
+    frame = _capture_full_frame()
+    return crop_to_capture_region(frame) if region else frame
+
+
+def _capture_full_frame():
     user_platform = platform.system()
 
     if user_platform == "Windows":
         screenshot = pyautogui.screenshot()
-        screenshot.save(file_path)
     elif user_platform == "Linux":
-        # Use xlib to prevent scrot dependency for Linux
-        screen = Xlib.display.Display().screen()
-        size = screen.width_in_pixels, screen.height_in_pixels
-        screenshot = ImageGrab.grab(bbox=(0, 0, size[0], size[1]))
-        screenshot.save(file_path)
+        timestamp = time.time()
+        return Frame(capture_pixels(), timestamp)
     elif user_platform == "Darwin":  # (Mac OS)
-        # Use the screencapture utility to capture the screen with the cursor
-        subprocess.run(["screencapture", "-C", file_path])
+        # `screencapture` is the only way to include the cursor, and it can
+        # only write to a file, so go through a short-lived temporary file
+        file_descriptor, file_path = tempfile.mkstemp(suffix=".png")
+        os.close(file_descriptor)
+        try:
+            subprocess.run(["screencapture", "-C", file_path])
+            with Image.open(file_path) as img:
+                screenshot = img.convert("RGB")
+        finally:
+            os.remove(file_path)
     else:
-        print(f"The platform you're using ({user_platform}) is not currently supported")
-
-
-def compress_screenshot(raw_screenshot_filename, screenshot_filename):
-    with Image.open(raw_screenshot_filename) as img:
-        # Check if the image has an alpha channel (transparency)
-        if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
-            # Create a white background image
-            background = Image.new('RGB', img.size, (255, 255, 255))
-            # Paste the image onto the background, using the alpha channel as mask
-            background.paste(img, mask=img.split()[3])  # 3 is the alpha channel
-            # Save the result as JPEG
-            background.save(screenshot_filename, 'JPEG', quality=85)  # Adjust quality as needed
+        raise OSError(
+            f"The platform you're using ({user_platform}) is not currently supported"
+        )
+
+    return Frame.from_image(screenshot)
+
+
+def get_damage_monitor():
+    """
+    Return the process-wide X DAMAGE monitor, starting it on first use.
+
+    Returns None when change notifications are unavailable (not Linux, no
+    libXdamage, the extension is missing) or disabled with
+    `config.change_notifications == "poll"`; callers then poll frames.
+    """
+    global _damage_monitor, _damage_unavailable
+    if _damage_monitor is not None and _damage_monitor.is_alive():
+        return _damage_monitor
+    if _damage_unavailable or platform.system() != "Linux":
+        return None
+
+    name = config.change_notifications
+    if name not in CHANGE_NOTIFICATIONS:
+        raise CaptureBackendError(
+            f"Unknown change notification source '{name}', expected one of {', '.join(CHANGE_NOTIFICATIONS)}"
+        )
+    if name == "poll":
+        return None
+
+    try:
+        from operate.utils.damage import DamageMonitor
+
+        _damage_monitor = DamageMonitor()
+        _damage_monitor.start()
+    except CaptureBackendError as e:
+        if name == "damage":
+            raise
+        _damage_unavailable = True
+        _damage_monitor = None
+        if config.verbose:
+            print(
+                f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_BRIGHT_MAGENTA}[capture] X DAMAGE unavailable ({e}), polling frames {ANSI_RESET}"
+            )
+        return None
+
+    if config.verbose:
+        print("[get_damage_monitor] listening for X DAMAGE events")
+    return _damage_monitor
+
+
+def stop_damage_monitor():
+    global _damage_monitor
+    if _damage_monitor is not None:
+        _damage_monitor.stop()
+        _damage_monitor.join(timeout=1.0)
+    _damage_monitor = None
+
+
+def damage_since(timestamp):
+    """
+    Screen regions redrawn after `timestamp` as ``(x1, y1, x2, y2)`` boxes,
+    or None when no change notifications cover that period.
+    """
+    monitor = get_damage_monitor()
+    if monitor is None or timestamp < monitor.started_at:
+        return None
+    return monitor.regions_since(timestamp)
+
+
+def wait_for_settle(timeout=None):
+    """
+    Block until the screen stopped changing and return the last frame seen.
+
+    On Linux with the X DAMAGE extension the server reports redraws, so this
+    just waits for a quiet period and captures once. Otherwise frames come
+    from the background grabber when it runs and from polling `capture_frame`
+    otherwise. The screen counts as settled once it has been stable for
+    `config.settle_stable_ms`; after `timeout` seconds (default
+    `config.settle_timeout`) the newest frame is returned regardless. With
+    `config.fixed_sleep` this falls back to the old fixed one second sleep.
+    """
+    from operate.utils.change import wait_until_stable
+    from operate.utils.grabber import get_frame_grabber
+
+    if config.fixed_sleep:
+        time.sleep(1)
+        return capture_frame(region=False)
+
+    timeout = config.settle_timeout if timeout is None else timeout
+    started = time.time()
+
+    monitor = get_damage_monitor()
+    if monitor is not None:
+        from operate.utils.damage import wait_for_quiet
+
+        wait_for_quiet(monitor, started, config.settle_stable_ms, timeout)
+        if config.verbose:
+            print(
+                "[wait_for_settle] no damage for",
+                config.settle_stable_ms,
+                "ms after",
+                round(time.time() - started, 3),
+                "s",
+            )
+        return capture_frame(region=False)
+
+    grabber = get_frame_grabber()
+    # Only frames captured after the request can show the result of the last action
+    last = {"timestamp": started}
+
+    def next_frame():
+        if grabber is not None:
+            frame = grabber.latest(newer_than=last["timestamp"], timeout=timeout)
         else:
-            # If no alpha channel, simply convert and save
-            img.convert('RGB').save(screenshot_filename, 'JPEG', quality=85)
+            time.sleep(config.settle_poll_interval)
+            frame = capture_frame(region=False)
+        if frame is not None:
+            last["timestamp"] = frame.timestamp
+        return frame
+
+    frame = wait_until_stable(
+        next_frame, stable_ms=config.settle_stable_ms, timeout=timeout
+    )
+    if frame is None:
+        frame = capture_frame(region=False)
+
+    if config.verbose:
+        print("[wait_for_settle] settled after", round(time.time() - started, 3), "s")
+    return frame
+
+
+def capture_settled_frame():
+    """
+    Return the frame an agent step should look at, once the UI had time to
+    settle after the previous action, cropped to `config.capture_region`.
+    """
+    return crop_to_capture_region(wait_for_settle())
+
+
+def save_debug_screenshot(frame, file_name="screenshot.png"):
+    """
+    Write `frame` into the `screenshots` directory, but only when debugging
+    asked for it (`--verbose` or `--save-screenshots`).
+    """
+    if not (config.verbose or config.save_screenshots):
+        return None
+
+    screenshots_dir = "screenshots"
+    if not os.path.exists(screenshots_dir):
+        os.makedirs(screenshots_dir)
+
+    file_path = os.path.join(screenshots_dir, file_name)
+    frame.save(file_path)
+    return file_path
+
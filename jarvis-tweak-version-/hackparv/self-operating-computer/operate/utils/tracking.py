@@ -0,0 +1,185 @@
+"""
+Carry YOLO detections over from one step to the next.
+
+Most actions only redraw part of the screen, a menu or a dialog. Instead of
+running the detector on the whole frame every step, `DetectionTracker` finds
+the regions that changed since the previous detection, re-detects only there
+and keeps the other boxes. Each region is padded and grown over every element
+it touches, so elements cut by a region edge are still seen whole. Every tracked element has an id that stays the
+same while it is on screen, so "~N" labels keep their meaning across steps.
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Tuple
+
+from operate.utils.change import dirty_tile_counts, merge_tiles
+
+
+@dataclass
+class Track:
+    """A detected element and the id of its label."""
+
+    id: int
+    box: Tuple[float, float, float, float]
+
+
+def box_iou(a, b):
+    width = min(a[2], b[2]) - max(a[0], b[0])
+    height = min(a[3], b[3]) - max(a[1], b[1])
+    if width <= 0 or height <= 0:
+        return 0.0
+    intersection = width * height
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def _intersects(box, region):
+    return not (
+        box[2] <= region[0]
+        or region[2] <= box[0]
+        or box[3] <= region[1]
+        or region[3] <= box[1]
+    )
+
+
+def _merge_overlapping(boxes):
+    """Union boxes that overlap until none do, so no pixel is detected twice."""
+    boxes = [list(box) for box in boxes]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                if _intersects(boxes[i], boxes[j]):
+                    a, b = boxes[i], boxes.pop(j)
+                    boxes[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    merged = True
+                    break
+            if merged:
+                break
+    return [tuple(box) for box in boxes]
+
+
+class DetectionTracker:
+    """
+    Detections of the previous step and the frame they were made on.
+
+    Call `plan` with a new frame to learn where to detect, then `update` with
+    what the detector found there.
+
+    Attributes:
+        tile_size (int): Grid used to find the changed parts of the screen.
+        padding (int): Pixels added around every changed region before detecting,
+            before it is grown over the elements it touches.
+        max_fraction (float): Detect on the whole frame once more than this
+            fraction of it changed.
+        match_iou (float): Overlap at which a new box is taken for an element
+            tracked before, and keeps its id.
+    """
+
+    def __init__(self, tile_size=64, padding=64, max_fraction=0.5, match_iou=0.5):
+        self.tile_size = tile_size
+        self.padding = padding
+        self.max_fraction = max_fraction
+        self.match_iou = match_iou
+        self.reset()
+
+    def reset(self):
+        self.previous = None
+        self.tracks = []
+        self._next_id = 0
+
+    def plan(self, frame):
+        """
+        Return the regions of `frame` to run the detector on: the changed
+        regions, padded, then grown until every tracked element they touch
+        lies entirely inside one of them. Returns None when the whole frame
+        must be detected, and an empty list when nothing changed.
+        """
+        previous = self.previous
+        if previous is None or previous.size != frame.size:
+            return None
+        counts = dirty_tile_counts(previous.pixels, frame.pixels, self.tile_size)
+        mask = counts > 0
+        if mask.mean() > self.max_fraction:
+            return None
+
+        width, height = frame.size
+        crops = _merge_overlapping(
+            (
+                max(0, x1 - self.padding),
+                max(0, y1 - self.padding),
+                min(width, x2 + self.padding),
+                min(height, y2 + self.padding),
+            )
+            for x1, y1, x2, y2 in merge_tiles(mask, self.tile_size, frame.size)
+        )
+        crops = self._grow_over_tracks(crops, frame.size)
+        area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in crops)
+        if area > self.max_fraction * width * height:
+            return None
+        return crops
+
+    def _grow_over_tracks(self, crops, size):
+        """Union every crop with the tracked boxes it intersects, until none is cut."""
+        width, height = size
+        grown = True
+        while grown:
+            grown = False
+            for i, crop in enumerate(crops):
+                x1, y1, x2, y2 = crop
+                for track in self.tracks:
+                    if _intersects(track.box, (x1, y1, x2, y2)):
+                        x1, y1 = min(x1, track.box[0]), min(y1, track.box[1])
+                        x2, y2 = max(x2, track.box[2]), max(y2, track.box[3])
+                box = (
+                    max(0, int(x1)),
+                    max(0, int(y1)),
+                    min(width, int(math.ceil(x2))),
+                    min(height, int(math.ceil(y2))),
+                )
+                if box != crop:
+                    crops[i] = box
+                    grown = True
+            if grown:
+                crops = _merge_overlapping(crops)
+        return crops
+
+    def update(self, frame, boxes, regions=None):
+        """
+        Record the detections of `frame` and return the tracks to label.
+
+        Without `regions`, `boxes` are the detections of the whole frame.
+        Otherwise they are the detections of the `regions` from `plan`, in
+        frame coordinates. Elements intersecting a region are replaced by
+        what was detected there, all others are kept from the previous step.
+        A detection matching a replaced element keeps its id.
+        """
+        if regions is None:
+            candidates, kept = self.tracks, []
+        else:
+            kept = [
+                track
+                for track in self.tracks
+                if not any(_intersects(track.box, region) for region in regions)
+            ]
+            candidates = [track for track in self.tracks if track not in kept]
+
+        tracks = list(kept)
+        unmatched = list(candidates)
+        for box in boxes:
+            box = tuple(float(value) for value in box)
+            match = max(unmatched, key=lambda track: box_iou(track.box, box), default=None)
+            if match is not None and box_iou(match.box, box) >= self.match_iou:
+                unmatched.remove(match)
+                tracks.append(Track(match.id, box))
+            else:
+                tracks.append(Track(self._next_id, box))
+                self._next_id += 1
+
+        # older elements first, they win when labels overlap
+        tracks.sort(key=lambda track: track.id)
+        self.tracks = tracks
+        self.previous = frame
+        return tracks
@@ -0,0 +1,108 @@
+"""
+Worker processes for CPU heavy work.
+
+OCR, YOLO detection and similar inference would otherwise hold the GIL (and
+the agent's event loop) while it runs. Work submitted here runs in separate
+processes, so it overlaps with network waits and with the main thread;
+coroutines await it through `run_in_worker`.
+
+Task functions live in this module and only import what they need, because
+the workers start with "spawn" and re-import them from scratch. Each worker
+keeps the models it loaded for its next tasks, and `get_process_pool` can
+load them as soon as the worker starts.
+
+OCR and detection have a pool each, so a long OCR job never queues a
+detection the next model request waits for.
+"""
+
+import asyncio
+import atexit
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Pool name, e.g. "ocr" or "detector" -> its ProcessPoolExecutor
+_process_pools = {}
+_process_pool_lock = threading.Lock()
+
+# Models loaded inside a worker process, kept for the next task
+_worker_models = {}
+
+
+def get_process_pool(name, max_workers=1, preload=()):
+    """
+    Return the process-wide worker pool `name`, starting it on first use.
+
+    `preload` lists ``(loader, args)`` pairs, e.g. ``(load_detector,
+    (weights,))``, each worker runs when it starts. Both arguments only
+    matter to the call that starts the pool.
+    """
+    with _process_pool_lock:
+        pool = _process_pools.get(name)
+        if pool is None:
+            # "spawn" rather than "fork": the parent runs X11 and capture
+            # threads that must not be duplicated mid-call into the child
+            pool = _process_pools[name] = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_preload_models,
+                initargs=(tuple(preload),),
+            )
+        return pool
+
+
+def shutdown_process_pools():
+    with _process_pool_lock:
+        for pool in _process_pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        _process_pools.clear()
+
+
+atexit.register(shutdown_process_pools)
+
+
+async def run_in_worker(name, function, *args):
+    """Run a task function of this module in the pool `name` and await its result."""
+    return await asyncio.wrap_future(get_process_pool(name).submit(function, *args))
+
+
+def _preload_models(preload):
+    for loader, args in preload:
+        try:
+            loader(*args)
+        except Exception:
+            # the first task using the model raises the error again, in the parent
+            pass
+
+
+def load_ocr_engine(engine_name, languages, threads=None, gpu=True, options=None):
+    """The OCR engine of this process, loaded on first use."""
+    from operate.utils.ocr_engines import create_ocr_engine
+
+    options = options or {}
+    key = (engine_name, tuple(languages), gpu, tuple(sorted(options.items())))
+    engine = _worker_models.get(key)
+    if engine is None:
+        engine = create_ocr_engine(
+            engine_name, languages, threads, gpu, **options
+        ).load()
+        _worker_models[key] = engine
+    return engine
+
+
+def ocr_readtext(engine_name, pixels, languages, threads=None, gpu=True, options=None):
+    """Run an OCR engine in a worker process, loading it once per worker."""
+    engine = load_ocr_engine(engine_name, languages, threads, gpu, options)
+    return engine.readtext(pixels)
+
+
+def load_detector(weights, threads=None):
+    """The resident YOLO detector of this process, see `operate.models.detector`."""
+    from operate.models.detector import get_detector
+
+    return get_detector(weights, threads).load()
+
+
+def yolo_detect(weights, pixels, threads=None):
+    """Detect UI elements in a worker process, loading the model once per worker."""
+    return load_detector(weights, threads).detect(pixels)
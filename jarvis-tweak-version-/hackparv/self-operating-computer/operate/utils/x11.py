@@ -0,0 +1,312 @@
+"""
+Direct libX11 / libXext bindings for fast screen capture on Linux.
+
+`python-xlib` speaks the X protocol over the socket, so every pixel of a
+screenshot is serialized by the server and parsed back in Python. The MIT-SHM
+extension lets the server copy the framebuffer straight into a shared memory
+segment instead, which is what this module uses through `ctypes`.
+"""
+
+import ctypes
+import ctypes.util
+
+import numpy as np
+
+from operate.exceptions import CaptureBackendError
+
+ZPixmap = 2
+AllPlanes = 0xFFFFFFFF
+IPC_PRIVATE = 0
+IPC_CREAT = 0o1000
+IPC_RMID = 0
+
+
+class XImage(ctypes.Structure):
+    _fields_ = [
+        ("width", ctypes.c_int),
+        ("height", ctypes.c_int),
+        ("xoffset", ctypes.c_int),
+        ("format", ctypes.c_int),
+        ("data", ctypes.c_void_p),
+        ("byte_order", ctypes.c_int),
+        ("bitmap_unit", ctypes.c_int),
+        ("bitmap_bit_order", ctypes.c_int),
+        ("bitmap_pad", ctypes.c_int),
+        ("depth", ctypes.c_int),
+        ("bytes_per_line", ctypes.c_int),
+        ("bits_per_pixel", ctypes.c_int),
+        ("red_mask", ctypes.c_ulong),
+        ("green_mask", ctypes.c_ulong),
+        ("blue_mask", ctypes.c_ulong),
+        ("obdata", ctypes.c_void_p),
+        # struct funcs: create, destroy, get_pixel, put_pixel, sub_image, add_pixel
+        ("f", ctypes.c_void_p * 6),
+    ]
+
+
+class XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ("shmseg", ctypes.c_ulong),
+        ("shmid", ctypes.c_int),
+        ("shmaddr", ctypes.c_void_p),
+        ("readOnly", ctypes.c_int),
+    ]
+
+
+class XErrorEvent(ctypes.Structure):
+    _fields_ = [
+        ("type", ctypes.c_int),
+        ("display", ctypes.c_void_p),
+        ("resourceid", ctypes.c_ulong),
+        ("serial", ctypes.c_ulong),
+        ("error_code", ctypes.c_ubyte),
+        ("request_code", ctypes.c_ubyte),
+        ("minor_code", ctypes.c_ubyte),
+    ]
+
+
+XErrorHandler = ctypes.CFUNCTYPE(
+    ctypes.c_int, ctypes.c_void_p, ctypes.POINTER(XErrorEvent)
+)
+
+_libraries = None
+_errors = []
+
+
+@XErrorHandler
+def _record_error(display, event):
+    # The default Xlib handler calls exit(), which would take the whole agent
+    # down on a failed XShmAttach (e.g. a remote display). Record instead.
+    _errors.append(event.contents.error_code)
+    return 0
+
+
+def _load_library(name):
+    path = ctypes.util.find_library(name)
+    if not path:
+        raise CaptureBackendError(f"lib{name} could not be found")
+    return ctypes.CDLL(path)
+
+
+def load_libraries():
+    """
+    Load and prototype libX11, libXext and libc once per process.
+
+    Returns a ``(xlib, xext, libc)`` tuple.
+    """
+    global _libraries
+    if _libraries is not None:
+        return _libraries
+
+    xlib = _load_library("X11")
+    xext = _load_library("Xext")
+    libc = _load_library("c")
+
+    xlib.XInitThreads.restype = ctypes.c_int
+    xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+    xlib.XOpenDisplay.restype = ctypes.c_void_p
+    xlib.XCloseDisplay.argtypes = [ctypes.c_void_p]
+    xlib.XDefaultScreen.argtypes = [ctypes.c_void_p]
+    xlib.XDefaultScreen.restype = ctypes.c_int
+    xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+    xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+    xlib.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    xlib.XDefaultVisual.restype = ctypes.c_void_p
+    xlib.XDefaultDepth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    xlib.XDefaultDepth.restype = ctypes.c_int
+    xlib.XDisplayWidth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    xlib.XDisplayWidth.restype = ctypes.c_int
+    xlib.XDisplayHeight.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    xlib.XDisplayHeight.restype = ctypes.c_int
+    xlib.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    xlib.XDestroyImage.argtypes = [ctypes.POINTER(XImage)]
+    xlib.XSetErrorHandler.argtypes = [XErrorHandler]
+    xlib.XSetErrorHandler.restype = ctypes.c_void_p
+
+    xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+    xext.XShmQueryExtension.restype = ctypes.c_int
+    xext.XShmCreateImage.argtypes = [
+        ctypes.c_void_p,
+        ctypes.c_void_p,
+        ctypes.c_uint,
+        ctypes.c_int,
+        ctypes.c_void_p,
+        ctypes.POINTER(XShmSegmentInfo),
+        ctypes.c_uint,
+        ctypes.c_uint,
+    ]
+    xext.XShmCreateImage.restype = ctypes.POINTER(XImage)
+    xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo)]
+    xext.XShmAttach.restype = ctypes.c_int
+    xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo)]
+    xext.XShmDetach.restype = ctypes.c_int
+    xext.XShmGetImage.argtypes = [
+        ctypes.c_void_p,
+        ctypes.c_ulong,
+        ctypes.POINTER(XImage),
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.c_ulong,
+    ]
+    xext.XShmGetImage.restype = ctypes.c_int
+
+    libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+    libc.shmget.restype = ctypes.c_int
+    libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+    libc.shmat.restype = ctypes.c_void_p
+    libc.shmdt.argtypes = [ctypes.c_void_p]
+    libc.shmdt.restype = ctypes.c_int
+    libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+    libc.shmctl.restype = ctypes.c_int
+
+    # The capture objects may be used from a background grabber thread
+    xlib.XInitThreads()
+    xlib.XSetErrorHandler(_record_error)
+
+    _libraries = (xlib, xext, libc)
+    return _libraries
+
+
+def open_display(display_name=None):
+    """Open a libX11 display connection, raising `CaptureBackendError` on failure."""
+    xlib, _, _ = load_libraries()
+    name = display_name.encode("utf-8") if display_name else None
+    display = xlib.XOpenDisplay(name)
+    if not display:
+        raise CaptureBackendError(f"Cannot open X display {display_name or '$DISPLAY'}")
+    return display
+
+
+class XShmCapture:
+    """
+    Screen capture through the MIT-SHM extension.
+
+    One display connection and one shared memory segment stay open for the
+    lifetime of the object. Each capture is a single `XShmGetImage` request
+    in which the X server copies the framebuffer into the segment, followed by
+    one BGRX -> RGB copy out of it. Works against Xvfb, which enables MIT-SHM
+    by default; remote displays cannot share memory and raise on creation.
+    """
+
+    def __init__(self, display_name=None):
+        self._xlib, self._xext, self._libc = load_libraries()
+        self._display = open_display(display_name)
+        self._image = None
+        self._shminfo = None
+        try:
+            if not self._xext.XShmQueryExtension(self._display):
+                raise CaptureBackendError("The X server does not support MIT-SHM")
+            self._allocate()
+        except Exception:
+            self.close()
+            raise
+
+    def _allocate(self):
+        xlib, xext, libc = self._xlib, self._xext, self._libc
+        display = self._display
+        screen = xlib.XDefaultScreen(display)
+
+        self._root = xlib.XDefaultRootWindow(display)
+        self.width = xlib.XDisplayWidth(display, screen)
+        self.height = xlib.XDisplayHeight(display, screen)
+
+        self._shminfo = XShmSegmentInfo()
+        self._image = xext.XShmCreateImage(
+            display,
+            xlib.XDefaultVisual(display, screen),
+            xlib.XDefaultDepth(display, screen),
+            ZPixmap,
+            None,
+            ctypes.byref(self._shminfo),
+            self.width,
+            self.height,
+        )
+        if not self._image:
+            raise CaptureBackendError("XShmCreateImage failed")
+
+        image = self._image.contents
+        if image.bits_per_pixel != 32:
+            raise CaptureBackendError(
+                f"Unsupported pixel format: {image.bits_per_pixel} bits per pixel"
+            )
+
+        size = image.bytes_per_line * image.height
+        shmid = libc.shmget(IPC_PRIVATE, size, IPC_CREAT | 0o600)
+        if shmid < 0:
+            raise CaptureBackendError("shmget failed")
+        address = libc.shmat(shmid, None, 0)
+        if address in (None, ctypes.c_void_p(-1).value):
+            libc.shmctl(shmid, IPC_RMID, None)
+            raise CaptureBackendError("shmat failed")
+
+        self._shminfo.shmid = shmid
+        self._shminfo.shmaddr = address
+        self._shminfo.readOnly = 0
+        image.data = address
+
+        del _errors[:]
+        attached = xext.XShmAttach(display, ctypes.byref(self._shminfo))
+        xlib.XSync(display, 0)
+        # Mark the segment for removal right away; the kernel frees it once
+        # both this process and the server have detached, even on a crash.
+        libc.shmctl(shmid, IPC_RMID, None)
+        if not attached or _errors:
+            self._shminfo.shmaddr = None
+            libc.shmdt(address)
+            raise CaptureBackendError("XShmAttach failed, is the display remote?")
+
+        # A zero-copy view over the shared segment, (height, width, BGRX)
+        raw = (ctypes.c_ubyte * size).from_address(address)
+        self._buffer = np.ctypeslib.as_array(raw).reshape(
+            image.height, image.bytes_per_line // 4, 4
+        )[:, : self.width]
+        if image.red_mask == 0xFF0000:
+            self._rgb = self._buffer[:, :, 2::-1]
+        else:
+            self._rgb = self._buffer[:, :, :3]
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    def capture(self, out=None):
+        """
+        Grab the whole screen and return it as a ``(height, width, 3)`` RGB array.
+
+        When `out` is given the pixels are written into it instead of a new
+        array, so callers can recycle their own buffers.
+        """
+        del _errors[:]
+        ok = self._xext.XShmGetImage(
+            self._display, self._root, self._image, 0, 0, AllPlanes
+        )
+        if not ok or _errors:
+            raise CaptureBackendError("XShmGetImage failed")
+
+        if out is None:
+            out = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        np.copyto(out, self._rgb)
+        return out
+
+    def close(self):
+        if self._display is None:
+            return
+        if self._shminfo is not None and self._shminfo.shmaddr:
+            self._xext.XShmDetach(self._display, ctypes.byref(self._shminfo))
+            self._xlib.XSync(self._display, 0)
+            self._libc.shmdt(self._shminfo.shmaddr)
+            self._shminfo.shmaddr = None
+        self._buffer = None
+        self._rgb = None
+        if self._image:
+            # XShm images only free the struct, never the shared data
+            self._xlib.XDestroyImage(self._image)
+            self._image = None
+        self._xlib.XCloseDisplay(self._display)
+        self._display = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
@@ -0,0 +1,42 @@
+import time
+
+from operate.utils.damage import busy_until, wait_for_quiet
+
+
+class RecordedMonitor:
+    """A `DamageMonitor` replaying fixed events, no X server needed."""
+
+    screen_area = 1920 * 1080
+
+    def __init__(self, events):
+        self.started_at = 0.0
+        self.events = events
+
+    def events_since(self, timestamp):
+        return [event for event in self.events if event[0] > timestamp]
+
+
+def test_small_redraws_do_not_count():
+    events = [(1.0, (0, 0, 1920, 1080)), (2.0, (10, 10, 12, 30)), (3.0, (10, 10, 12, 30))]
+    assert busy_until(events, 0.001 * 1920 * 1080) == 1.0
+
+
+def test_many_small_rectangles_add_up():
+    # a large repaint reported glyph by glyph
+    events = [(1.0 + i / 1000, (i, 0, i + 10, 10)) for i in range(100)]
+    assert busy_until(events, 0.001 * 1920 * 1080) > 1.0
+
+
+def test_blinking_caret_settles_without_waiting_for_the_timeout():
+    now = time.time()
+    caret = [(now - 0.5 + i * 0.1, (10, 10, 12, 30)) for i in range(10)]
+    started = time.time()
+    wait_for_quiet(RecordedMonitor(caret), started, stable_ms=100, timeout=2.0)
+    assert time.time() - started < 1.0
+
+
+def test_large_redraw_keeps_waiting():
+    started = time.time()
+    redraw = [(started + 0.2, (0, 0, 800, 600))]
+    wait_for_quiet(RecordedMonitor(redraw), started, stable_ms=100, timeout=2.0)
+    assert time.time() - started >= 0.3
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from operate.utils.label import suppress_overlaps
+
+
+def is_overlapping(box1, box2):
+    """The check `add_labels` ran on every pair before the grid index."""
+    x1_box1, y1_box1, x2_box1, y2_box1 = box1
+    x1_box2, y1_box2, x2_box2, y2_box2 = box2
+    if x1_box1 > x2_box2 or x1_box2 > x2_box1:
+        return False
+    if y1_box1 > y2_box2 or y1_box2 > y2_box1:
+        return False
+    return True
+
+
+def iou(box1, box2):
+    width = min(box1[2], box2[2]) - max(box1[0], box2[0])
+    height = min(box1[3], box2[3]) - max(box1[1], box2[1])
+    intersection = max(width, 0) * max(height, 0)
+    union = (
+        (box1[2] - box1[0]) * (box1[3] - box1[1])
+        + (box2[2] - box2[0]) * (box2[3] - box2[1])
+        - intersection
+    )
+    return intersection / max(union, 1e-9)
+
+
+def greedy(boxes, overlaps):
+    kept = []
+    for index, box in enumerate(boxes):
+        if not any(overlaps(box, boxes[other]) for other in kept):
+            kept.append(index)
+    return kept
+
+
+def random_boxes(rng, count, width=1920, height=1080):
+    """Dense UI-like layouts: mostly small boxes, some wide bars and large panels."""
+    sizes = np.where(
+        rng.random((count, 1)) < 0.9,
+        rng.integers(8, 80, (count, 2)),
+        rng.integers(200, 1200, (count, 2)),
+    )
+    corners = rng.integers(0, [width, height], (count, 2))
+    # whole pixels, so boxes exactly touching each other are common
+    return np.concatenate([corners, corners + sizes], axis=1).tolist()
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_overlap_rule_matches_the_pairwise_loop(seed):
+    rng = np.random.default_rng(seed)
+    boxes = random_boxes(rng, int(rng.integers(2, 1500)))
+    assert suppress_overlaps(boxes, "overlap") == greedy(boxes, is_overlapping)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_iou_rule_matches_the_pairwise_loop(seed):
+    rng = np.random.default_rng(seed)
+    boxes = random_boxes(rng, int(rng.integers(2, 600)))
+    expected = greedy(boxes, lambda a, b: iou(a, b) > 0.3)
+    assert suppress_overlaps(boxes, "iou", 0.3) == expected
+
+
+def test_large_boxes_bypass_the_grid():
+    boxes = [[0, 0, 10, 10], [500, 500, 510, 510], [5, 5, 2000, 2000], [3000, 0, 3010, 10]]
+    assert suppress_overlaps(boxes, "overlap", max_cells=4) == greedy(boxes, is_overlapping)
+
+
+def test_none_keeps_everything():
+    assert suppress_overlaps([[0, 0, 10, 10], [0, 0, 10, 10]], "none") == [0, 1]
+
+
+def test_unknown_rule():
+    with pytest.raises(ValueError):
+        suppress_overlaps([[0, 0, 10, 10]], "nearest")
@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from operate.utils.tracking import DetectionTracker
+
+WIDTH, HEIGHT = 1000, 600
+
+
+def make_frame(changes=()):
+    """A stand-in for `Frame`, the tracker only reads `pixels` and `size`."""
+    pixels = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    for x1, y1, x2, y2 in changes:
+        pixels[y1:y2, x1:x2] = 255
+    return SimpleNamespace(pixels=pixels, size=(WIDTH, HEIGHT))
+
+
+def detect_in(regions, elements):
+    """What a detector run on every region finds: the elements it contains."""
+    return [
+        list(box)
+        for box in elements
+        if any(
+            region[0] <= box[0] and region[1] <= box[1] and box[2] <= region[2] and box[3] <= region[3]
+            for region in regions
+        )
+    ]
+
+
+def start(elements):
+    tracker = DetectionTracker(tile_size=64, padding=64)
+    tracks = tracker.update(make_frame(), elements)
+    return tracker, {track.id: track.box for track in tracks}
+
+
+def test_change_at_the_edge_of_an_element_keeps_it():
+    tracker, before = start([[0, 0, 300, 100], [600, 400, 700, 450]])
+
+    frame = make_frame([(285, 0, 295, 10)])
+    regions = tracker.plan(frame)
+    assert any(
+        region[0] <= 0 and region[1] <= 0 and 300 <= region[2] and 100 <= region[3]
+        for region in regions
+    )
+
+    tracks = tracker.update(frame, detect_in(regions, [[0, 0, 300, 100], [600, 400, 700, 450]]), regions)
+    assert {track.id: track.box for track in tracks} == before
+
+
+def test_element_wider_than_the_padded_crop_keeps_its_id():
+    tracker, before = start([[0, 0, 900, 50]])
+
+    frame = make_frame([(880, 10, 890, 20)])
+    regions = tracker.plan(frame)
+    tracks = tracker.update(frame, detect_in(regions, [[0, 0, 900, 50]]), regions)
+    assert [(track.id, track.box) for track in tracks] == list(before.items())
+
+
+def test_new_element_in_a_changed_region_gets_a_new_id():
+    tracker, before = start([[0, 0, 100, 50], [800, 500, 900, 550]])
+
+    frame = make_frame([(400, 300, 460, 330)])
+    regions = tracker.plan(frame)
+    elements = [[0, 0, 100, 50], [800, 500, 900, 550], [400, 300, 460, 330]]
+    tracks = tracker.update(frame, detect_in(regions, elements), regions)
+    assert {track.id: track.box for track in tracks} == {**before, 2: (400.0, 300.0, 460.0, 330.0)}
+
+
+def test_unchanged_frame_detects_nothing():
+    tracker, _ = start([[0, 0, 100, 50]])
+    assert tracker.plan(make_frame()) == []